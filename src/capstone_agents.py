@@ -19,11 +19,16 @@ specialized AI Agents and deterministic tools.
 
 Key Features:
 - **Multi-Agent Architecture:** Splits the task between a `HeaderAgent` (metadata) and a `LineItemAgent` (tables).
+- **Single-Call Fast Path:** An `InvoiceAgent` first extracts header and line items in one call; the
+  specialized agents only run when that combined result fails validation.
 - **Tiered Self-Correction:** Automatically detects missing data and attempts to recover it using a cost-efficient
   fallback strategy: regex on OCR text first (Tier 1), followed by LLM extraction (Tier 2) if necessary.
 - **Resilience:** Implements retry logic with exponential backoff for API stability.
+- **Concurrency:** Processes several invoices at once, throttled by a shared rate limiter.
+- **Non-blocking Logging:** Status output goes through a `QueueHandler`; a background listener does the console I/O.
 
 Classes:
+    RateLimiter: Shared token-bucket limiter for all Gemini API calls.
     InvoiceOrchestrator: The central controller for the extraction pipeline.
 
 Dependencies:
@@ -33,11 +38,19 @@ Dependencies:
 """
 
 import asyncio
-import json
+import logging
 import os
+import queue
+import sys
+import random
+import re
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener
 from typing import Any, Dict, Optional, List
 from pathlib import Path
 
+import orjson
 from dotenv import load_dotenv
 from pydantic import ValidationError, BaseModel, Field
 
@@ -46,14 +59,114 @@ from google.adk.agents import Agent
 from google.adk.runners import InMemoryRunner
 
 # Local imports (Clean Architecture)
-from ocr_tools import run_pdf_ocr_google
+from ocr_tools import OcrBatcher, OcrCache
 from regex_tools import InvoiceRegexExtractor
-# UPDATE: Added apply_client_case_corrections to imports
-from utils import load_all_coaching_invoices, strip_markdown_json_fences, enforce_allowed_client_cases, apply_client_case_corrections
+from utils import load_all_coaching_invoices, parse_llm_json, correct_and_enforce_client_cases, get_header_window
 from llm_models import InvoiceLLMResult, InvoiceHeader, ClientCase
 
 # --- Configuration ---
 MODEL_NAME = "gemini-2.5-flash-lite"  # Fast, efficient model for extraction
+MAX_CONCURRENT_INVOICES = 4  # Invoices processed in parallel by main()
+GEMINI_REQUESTS_PER_MINUTE = 15  # Shared request budget across all agents
+MAX_BACKOFF_SECONDS = 30  # Cap for the exponential fallback when no Retry-After is given
+RETRY_AFTER_JITTER_SECONDS = 2.0  # Extra random wait on top of a server-given Retry-After
+INVOICE_TIMEOUT_SECONDS = 180  # Upper bound per invoice, so one stuck request cannot stall the batch
+ADK_USER_ID = "invoice_pipeline"  # User id for the per-call ADK sessions (deleted after each call)
+
+logger = logging.getLogger("capstone_agents")
+
+def start_log_listener() -> QueueListener:
+    """
+    Routes this module's log records through a queue to a background thread.
+
+    Under concurrent processing, a direct `print` blocks the event loop on console I/O.
+    With a `QueueHandler`, logging from a coroutine is just a queue put; the
+    `QueueListener` thread does the actual writing to stdout.
+
+    Returns:
+        QueueListener: The started listener. Call `stop()` on it to flush remaining records.
+    """
+    log_queue: queue.Queue = queue.Queue(-1)
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter("%(message)s"))
+
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    listener = QueueListener(log_queue, console)
+    listener.start()
+    return listener
+
+# --- Rate Limiting ---
+
+class RateLimiter:
+    """
+    Shared token-bucket limiter for Gemini API calls.
+
+    Every agent call acquires a token before it is sent, so the combined request
+    rate of all concurrent workers stays within the model's RPM budget. When a
+    429/503 is observed, `pause()` drains the bucket so every worker backs off
+    at the same time instead of each one hammering the API on its own schedule.
+    """
+    def __init__(self, requests_per_minute: int):
+        self.capacity = max(1, requests_per_minute)
+        self.refill_per_second = self.capacity / 60.0
+        self._tokens = float(self.capacity)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Waits until a request token is available (and any pause has expired)."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                elapsed = now - self._last_refill
+                self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_per_second)
+                self._last_refill = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.refill_per_second)
+
+    def pause(self, seconds: float) -> None:
+        """Drains the bucket and blocks all workers for `seconds` (e.g. after a 429)."""
+        self._tokens = 0.0
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+# Gemini reports the server-requested delay as 'retryDelay': '17s' (RetryInfo) or 'Please retry in 17.2s.'
+_RETRY_DELAY_RE = re.compile(r"(?:retrydelay['\"]?\s*[:=]\s*['\"]?|retry in\s+)(\d+(?:\.\d+)?)\s*s", re.IGNORECASE)
+
+def _extract_retry_after(error: Exception) -> Optional[float]:
+    """
+    Returns the delay (in seconds) the API asked for on a 429/503, if it told us.
+
+    Checks the HTTP `Retry-After` header of the underlying response first, then the
+    RetryInfo delay embedded in the error payload/message. Returns None if neither is present.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        retry_after = headers.get("retry-after") or headers.get("Retry-After")
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+
+    for source in (getattr(error, "details", None), error):
+        if source is None:
+            continue
+        match = _RETRY_DELAY_RE.search(str(source))
+        if match:
+            return float(match.group(1))
+    return None
 
 # --- Partial Models for Individual Agents ---
 
@@ -73,6 +186,24 @@ class LineItemsResult(BaseModel):
     clientCases: List[ClientCase] = Field(default_factory=list)
     clientCasesNoActivity: List[str] = Field(default_factory=list)
 
+class CombinedResult(BaseModel):
+    """
+    Intermediate data model for the InvoiceAgent's single-call output.
+    Union of `HeaderResult` and `LineItemsResult`; split again by the Orchestrator.
+    """
+    invoiceHeader: InvoiceHeader
+    isCoachingInvoice: bool
+    clientCases: List[ClientCase] = Field(default_factory=list)
+    clientCasesNoActivity: List[str] = Field(default_factory=list)
+
+class RecoveryResult(BaseModel):
+    """
+    Intermediate data model for the Tier 2 self-correction call.
+    Only carries the identifiers that were still missing after the Regex pass.
+    """
+    kvkNumber: Optional[str] = None
+    vatNumber: Optional[str] = None
+
 # --- Prompts ---
 
 def get_header_prompt(raw_text: str, hints: Dict[str, Any]) -> str:
@@ -83,7 +214,8 @@ def get_header_prompt(raw_text: str, hints: Dict[str, Any]) -> str:
     and specifically warns against common hallucinations (e.g., confusing Client with Supplier).
 
     Args:
-        raw_text (str): The full text content extracted from the invoice PDF.
+        raw_text (str): The text content extracted from the invoice PDF (optionally windowed
+                        to the header regions via `utils.get_header_window`).
         hints (Dict[str, Any]): A dictionary of 'best guess' values (kvk, vat, etc.) 
                                 derived from the pre-processing Regex step.
 
@@ -130,6 +262,10 @@ OUTPUT SCHEMA (JSON ONLY):
 }}
 """
 
+def format_allowed_cases(allowed_cases: List[str]) -> str:
+    """Renders the allow-list block for the LineItemAgent and InvoiceAgent prompts."""
+    return "\n".join(allowed_cases) if allowed_cases else "(No allowed cases provided)"
+
 def get_line_item_prompt(raw_text: str, allowed_cases: List[str]) -> str:
     """
     Constructs the prompt for the LineItemAgent.
@@ -145,7 +281,7 @@ def get_line_item_prompt(raw_text: str, allowed_cases: List[str]) -> str:
     Returns:
         str: A fully formatted instruction string for the LLM.
     """
-    allowed_list_str = "\n".join(allowed_cases) if allowed_cases else "(No allowed cases provided)"
+    allowed_list_str = format_allowed_cases(allowed_cases)
     
     return f"""
 You are the 'LineItemAgent', a specialist in extracting coaching sessions and hours from invoices.
@@ -182,6 +318,134 @@ OUTPUT SCHEMA (JSON ONLY):
 }}
 """
 
+def get_combined_prompt(raw_text: str, hints: Dict[str, Any], allowed_cases: List[str]) -> str:
+    """
+    Constructs the single-call prompt for the InvoiceAgent.
+
+    Combines the HeaderAgent and LineItemAgent instructions so the raw text is sent
+    to the model once per invoice instead of twice. The same anti-hallucination rules
+    (Client vs Supplier, no invented invoice numbers, strict 'Allowed List') apply.
+
+    Args:
+        raw_text (str): The full text content extracted from the invoice PDF.
+        hints (Dict[str, Any]): 'Best guess' header values from the pre-processing Regex step.
+        allowed_cases (List[str]): The valid 'raw' client case strings for this invoice.
+
+    Returns:
+        str: A fully formatted instruction string for the LLM.
+    """
+    allowed_list_str = format_allowed_cases(allowed_cases)
+
+    return f"""
+You are the 'InvoiceAgent', a specialist in extracting administrative metadata AND coaching sessions from Dutch invoices.
+
+YOUR GOAL: Extract the header information and the client case line items into ONE JSON object.
+
+INPUT DATA:
+- KVK Hint: {hints.get('kvk_hint')}
+- VAT Hint: {hints.get('vat_hint')}
+- Date Hint: {hints.get('invoice_date_hint')}
+- Invoice # Hint: {hints.get('invoice_number_hint')}
+
+CRITICAL RULE: ALLOWED CLIENT CASES
+You may ONLY use client case numbers from this list. If a code on the invoice is not in this list (or is a typo), do NOT include it as a valid case, or try to correct it to the nearest match in this list.
+--- START ALLOWED LIST ---
+{allowed_list_str}
+--- END ALLOWED LIST ---
+
+RAW TEXT:
+{raw_text}
+
+HEADER INSTRUCTIONS:
+1. Extract the supplier name carefully. It is the party receiving payment.
+   - Look for 't.n.v.', 'IBAN Name', 'KvK' or 'BTW' indicators.
+   - CRITICAL: Do NOT select the name following 'Aan:', 'To:', 'Factuur aan:', or the address block of the invoice recipient. The entity being addressed is the Client, NOT the Supplier.
+
+2. Extract Invoice Number, Date (YYYY-MM-DD), KVK, and VAT.
+   - CRITICAL: Do NOT extract the Invoice Number from the "Source:" filename line at the top of the text.
+   - CRITICAL: Do NOT guess or invent a number (like '0008') from the file name.
+   - Only extract a number if it is clearly part of the invoice content (e.g. next to 'Factuurnummer', 'Ref', 'Kenmerk' or inside the text body).
+   - If no clear number is found, return null.
+
+3. Determine if this looks like a coaching invoice (isCoachingInvoice).
+
+LINE ITEM INSTRUCTIONS:
+4. Find all rows with hours/sessions.
+5. Map them to the 'validatedClientCaseNumber' from the ALLOWED LIST.
+6. If a date is mentioned for a line, extract it (YYYY-MM-DD).
+7. Sum hours if multiple lines exist for the same case (unless separate dates are needed).
+8. 'clientCasesNoActivity' are valid codes from the allowed list that appear on the invoice but have 0 hours or no cost.
+
+OUTPUT SCHEMA (JSON ONLY):
+{{
+  "invoiceHeader": {{
+    "supplierName": "string | null",
+    "invoiceNumber": "string | null",
+    "invoiceDate": "YYYY-MM-DD | null",
+    "kvkNumber": "string | null",
+    "vatNumber": "string | null"
+  }},
+  "isCoachingInvoice": boolean,
+  "clientCases": [
+    {{
+      "validatedClientCaseNumber": "string (must be in allowed list)",
+      "rawClientCaseNumber": "string (text as found on invoice)",
+      "date": "YYYY-MM-DD | null",
+      "durationHours": number | null
+    }}
+  ],
+  "clientCasesNoActivity": ["string", ...]
+}}
+"""
+
+def get_recovery_prompt(ocr_text: str, missing_kvk: bool, missing_vat: bool) -> str:
+    """
+    Constructs the Tier 2 self-correction prompt for the HeaderAgent.
+
+    Only the fields that are still missing are requested, so the model returns a
+    tiny JSON object instead of re-emitting the complete invoice header.
+
+    Args:
+        ocr_text (str): The text returned by the OCR Tool.
+        missing_kvk (bool): Whether the KvK number still needs to be recovered.
+        missing_vat (bool): Whether the VAT number still needs to be recovered.
+
+    Returns:
+        str: A fully formatted instruction string for the LLM.
+    """
+    missing_lines = []
+    schema_lines = []
+    if missing_kvk:
+        missing_lines.append("- KvK Number")
+        schema_lines.append('  "kvkNumber": "string | null"')
+    if missing_vat:
+        missing_lines.append("- VAT Number")
+        schema_lines.append('  "vatNumber": "string | null"')
+
+    missing_str = "\n".join(missing_lines)
+    schema_str = ",\n".join(schema_lines)
+
+    return f"""
+TASK: RECOVER MISSING DATA (SELF-CORRECTION)
+
+Previous attempts (Text & Regex) failed to find:
+{missing_str}
+
+--- BEGIN OCR TEXT ---
+{ocr_text}
+--- END OCR TEXT ---
+
+INSTRUCTIONS:
+1. Search the OCR text specifically for 'KvK' or 'BTW' numbers.
+2. Sometimes OCR adds spaces (e.g. "84 72 61 80"). Try to reconstruct it.
+3. Return ONLY the fields listed in the schema below. Use null if a value cannot be found.
+
+OUTPUT SCHEMA (JSON ONLY):
+{{
+{schema_str}
+}}
+"""
+
 # --- The Orchestrator Class ---
 
 class InvoiceOrchestrator:
@@ -190,19 +454,52 @@ class InvoiceOrchestrator:
     
     Responsibilities:
     1. Initializes Agents with specific roles and configurations.
-    2. Dispatches tasks to agents in parallel (AsyncIO).
+    2. Runs the single-call InvoiceAgent, falling back to the specialized agents in parallel
+       (AsyncIO) if needed; all calls are throttled by a shared `RateLimiter`.
     3. Monitors outputs for missing critical data (KvK/VAT).
     4. Executes the Tiered Self-Correction strategy (OCR -> Regex -> LLM) if needed.
     5. Aggregates and validates the final result against business rules.
+
+    Attributes:
+        invoice_dir (Path): Directory containing the source PDFs (needed for the OCR Tool).
+        ocr_out_dir (Path): Directory where OCR dumps are written for observability.
     """
-    def __init__(self):
+    def __init__(self, invoice_dir: Path = Path("data/invoices"), output_dir: Path = Path("data/llm_ready")):
         self._setup_auth()
+        self.rate_limiter = RateLimiter(GEMINI_REQUESTS_PER_MINUTE)
+
+        # Agents and runners are stateless between calls (every call gets its own
+        # session), so one instance per role is shared across all invoices.
+        self._invoice_agent = self.create_invoice_agent()
+        self._header_agent = self.create_header_agent()
+        self._lines_agent = self.create_line_item_agent()
+        self._invoice_runner = InMemoryRunner(agent=self._invoice_agent)
+        self._header_runner = InMemoryRunner(agent=self._header_agent)
+        self._lines_runner = InMemoryRunner(agent=self._lines_agent)
+
+        # Paths are resolved (and created) once here instead of per invoice.
+        self.invoice_dir = invoice_dir
+        self.ocr_out_dir = output_dir / "ocr_texts"
+        self.ocr_out_dir.mkdir(parents=True, exist_ok=True)
+        self.ocr_cache = OcrCache(output_dir / "ocr_cache")
+        self.ocr_batcher = OcrBatcher(self.ocr_cache)
         
     def _setup_auth(self):
         """Loads API keys from the environment."""
         load_dotenv(os.path.expanduser("~/.env"))
         if not os.getenv("GOOGLE_API_KEY"):
-            print("⚠️ Warning: GOOGLE_API_KEY not found in env.")
+            logger.warning("⚠️ Warning: GOOGLE_API_KEY not found in env.")
+
+    def create_invoice_agent(self) -> Agent:
+        """Creates the combined InvoiceAgent (header + line items) with deterministic settings (temperature=0)."""
+        return Agent(
+            name="InvoiceAgent",
+            model=MODEL_NAME,
+            instruction="You are a strict JSON extractor for invoice headers and line items.",
+            tools=[],
+            output_key="json_result",
+            generate_content_config={"temperature": 0.0}
+        )
 
     def create_header_agent(self) -> Agent:
             """Creates the HeaderAgent with deterministic settings (temperature=0)."""  
@@ -229,17 +526,22 @@ class InvoiceOrchestrator:
         )
 
 
-    async def _run_agent(self, agent: Agent, prompt: str, result_type: type, max_retries: int = 3) -> Optional[BaseModel]:
+    async def _run_agent(self, runner: InMemoryRunner, prompt: str, result_type: type, max_retries: int = 3) -> Optional[BaseModel]:
             """
-            Executes an Agent with built-in resilience.
+            Executes an Agent (via its shared runner) with built-in resilience.
             
             Features:
+            - Session Isolation: Each call runs in a fresh session, so the shared runner never
+              leaks conversation history between invoices or concurrent workers.
             - JSON Parsing: Automatically strips markdown fences from LLM output.
             - Pydantic Validation: Ensures the output matches the expected schema (`result_type`).
-            - Exponential Backoff: Retries on 429 (Rate Limit) or 503 (Service Unavailable) errors.
+            - Rate Limiting: Acquires a token from the shared `RateLimiter` before every call.
+            - Adaptive Backoff: Retries on 429 (Rate Limit) or 503 (Service Unavailable) errors.
+              Waits for the server's Retry-After delay when provided, else exponential backoff,
+              with jitter. The backoff pauses the shared limiter, so all concurrent workers throttle together.
 
             Args:
-                agent (Agent): The ADK agent instance to run.
+                runner (InMemoryRunner): The cached runner wrapping the agent to execute.
                 prompt (str): The user prompt string.
                 result_type (type): The Pydantic class to validate the output against.
                 max_retries (int): Number of retry attempts on failure.
@@ -247,26 +549,33 @@ class InvoiceOrchestrator:
             Returns:
                 Optional[BaseModel]: An instance of `result_type` if successful, else None.
             """
+            agent = runner.agent
             last_error = None
             
             for attempt in range(max_retries + 1):
-                runner = InMemoryRunner(agent=agent)
+                session_id = f"{agent.name}-{uuid.uuid4().hex}"
+                await self.rate_limiter.acquire()
                 try:
-                    response = await runner.run_debug(user_messages=prompt, quiet=True)
+                    response = await runner.run_debug(
+                        user_messages=prompt, user_id=ADK_USER_ID, session_id=session_id, quiet=True
+                    )
                     
+                    # Walk back from the last event (no reversed copy) and stop at the first text.
                     json_str = ""
-                    for event in response[::-1]:
-                        if hasattr(event, "content") and hasattr(event.content, "parts"):
-                            parts = [p.text for p in event.content.parts if p.text]
-                            if parts:
-                                json_str = "".join(parts)
-                                break
+                    for event in reversed(response):
+                        content = getattr(event, "content", None)
+                        parts = getattr(content, "parts", None) if content else None
+                        if not parts:
+                            continue
+                        texts = [p.text for p in parts if getattr(p, "text", None)]
+                        if texts:
+                            json_str = "".join(texts)
+                            break
                     
                     if not json_str:
                         raise ValueError("Empty response from model")
                         
-                    json_clean = strip_markdown_json_fences(json_str)
-                    return result_type.model_validate_json(json_clean)
+                    return result_type.model_validate(parse_llm_json(json_str))
                     
                 except Exception as e:
                     error_msg = str(e).lower()
@@ -275,15 +584,26 @@ class InvoiceOrchestrator:
                     last_error = e
                     
                     if is_overload and attempt < max_retries:
-                        wait_time = 2 * (2 ** attempt) 
-                        print(f"   ⏳ {agent.name} hit API limit/overload. Retrying in {wait_time}s... (Attempt {attempt+1}/{max_retries})")
-                        await asyncio.sleep(wait_time)
+                        # Jitter keeps concurrent workers from retrying in lockstep
+                        retry_after = _extract_retry_after(e)
+                        if retry_after is not None:
+                            # The server's delay is a minimum: only ever add to it
+                            wait_time = retry_after + random.uniform(0, RETRY_AFTER_JITTER_SECONDS)
+                        else:
+                            wait_time = min(2 * (2 ** attempt), MAX_BACKOFF_SECONDS) * random.uniform(0.5, 1.5)
+                        logger.warning(f"   ⏳ {agent.name} hit API limit/overload. Retrying in {wait_time:.1f}s... (Attempt {attempt+1}/{max_retries})")
+                        self.rate_limiter.pause(wait_time)
                     else:
                         if not is_overload:
-                            print(f"❌ Error in {agent.name}: {e}")
+                            logger.error(f"❌ Error in {agent.name}: {e}")
                             return None
+                finally:
+                    # Each attempt gets a fresh session; drop it so InMemorySessionService doesn't grow per call
+                    await runner.session_service.delete_session(
+                        app_name=runner.app_name, user_id=ADK_USER_ID, session_id=session_id
+                    )
 
-            print(f"❌ {agent.name} failed after {max_retries} retries. Last error: {last_error}")
+            logger.error(f"❌ {agent.name} failed after {max_retries} retries. Last error: {last_error}")
             return None
         
     async def process_invoice(self, invoice_data: Dict[str, Any]) -> Optional[InvoiceLLMResult]:
@@ -292,10 +612,12 @@ class InvoiceOrchestrator:
 
             Flow:
             1. **Prepare Prompts:** Constructs prompts using raw text and hints from the pre-processor.
-            2. **Parallel Execution:** Runs HeaderAgent and LineItemAgent concurrently for speed.
+            2. **Single Call:** Runs the InvoiceAgent for header and line items in one round-trip.
+               Only if that fails, runs HeaderAgent and LineItemAgent concurrently as a fallback.
             3. **Self-Correction:**
                - Checks if critical header data (KvK/VAT) is missing.
-               - If missing, triggers the **OCR Tool** (Google Cloud Vision).
+               - If missing, triggers the **OCR Tool** (Google Cloud Vision), unless the PDF has
+                 no embedded images (then the text layer already holds everything OCR could read).
                - Applies **Tier 1 Extraction** (Regex on OCR text) for low cost/latency.
                - Applies **Tier 2 Extraction** (LLM on OCR text) only if Regex fails.
             4. **Normalization:** Maps OCR typos (e.g., '125') to valid DB codes (e.g., 'I25').
@@ -327,65 +649,88 @@ class InvoiceOrchestrator:
             correction_map = invoice_data.get("correction_map", {})
             # --------------------------------------
 
-            header_prompt = get_header_prompt(raw_text, hints)
             # Gebruik de PROMPT lijst voor de agent (zodat hij typo's herkent die in de tekst staan)
-            lines_prompt = get_line_item_prompt(raw_text, prompt_allowed_cases) 
-
-            # 2. Run Agents in Parallel (Async)
-            print(f"🤖 Orchestrator: Dispatching agents for {filename}...")
-            
-            header_agent = self.create_header_agent()
-            lines_agent = self.create_line_item_agent()
+            combined_prompt = get_combined_prompt(raw_text, hints, prompt_allowed_cases)
+
+            # 2. Single-call fast path: header + line items in one round-trip
+            logger.info(f"🤖 Orchestrator: Dispatching InvoiceAgent for {filename}...")
+            combined_res = await self._run_agent(self._invoice_runner, combined_prompt, CombinedResult)
+
+            if combined_res:
+                header_res = HeaderResult(
+                    invoiceHeader=combined_res.invoiceHeader,
+                    isCoachingInvoice=combined_res.isCoachingInvoice,
+                )
+                lines_res = LineItemsResult(
+                    clientCases=combined_res.clientCases,
+                    clientCasesNoActivity=combined_res.clientCasesNoActivity,
+                )
+            else:
+                # Fallback: the specialized agents in parallel (Async)
+                logger.warning(f"⚠️ InvoiceAgent failed for {filename}. Dispatching specialized agents...")
+                # The HeaderAgent only needs the page heads/footers, not the line-item tables
+                header_prompt = get_header_prompt(get_header_window(raw_text), hints)
+                lines_prompt = get_line_item_prompt(raw_text, prompt_allowed_cases)
 
-            header_task = self._run_agent(header_agent, header_prompt, HeaderResult)
-            lines_task = self._run_agent(lines_agent, lines_prompt, LineItemsResult)
+                # TaskGroup: if one agent task dies unexpectedly, its sibling is cancelled
+                # instead of burning API quota on a result we can no longer use.
+                async with asyncio.TaskGroup() as tg:
+                    header_task = tg.create_task(self._run_agent(self._header_runner, header_prompt, HeaderResult))
+                    lines_task = tg.create_task(self._run_agent(self._lines_runner, lines_prompt, LineItemsResult))
 
-            header_res, lines_res = await asyncio.gather(header_task, lines_task)
+                header_res, lines_res = header_task.result(), lines_task.result()
 
             # 3. Handling Failures & Self-Correction (OCR Tool)
             if not header_res:
-                print(f"⚠️ Header Agent failed for {filename}")
+                logger.warning(f"⚠️ Header Agent failed for {filename}")
                 header_res = HeaderResult(invoiceHeader=InvoiceHeader(), isCoachingInvoice=False)
 
             # --- CAPSTONE TOOL USE: SELF-CORRECTION LOGIC ---
             # Check if critical data is missing (KvK or VAT)
-            if header_res and (not header_res.invoiceHeader.kvkNumber or not header_res.invoiceHeader.vatNumber):
-                print(f"⚠️ Missing KvK/VAT for {filename}. Orchestrator deciding to use OCR Tool...")
+            missing_header_ids = not header_res.invoiceHeader.kvkNumber or not header_res.invoiceHeader.vatNumber
+
+            # OCR only reads what is drawn in images; a PDF without images has nothing to add
+            # beyond the text layer the agent already saw, so its null answer is final.
+            if missing_header_ids and invoice_data.get("has_images") is False:
+                logger.info(f"   🚀 Skipping OCR Tool for {filename} (PDF contains no images; text layer is complete).")
+            elif missing_header_ids:
+                logger.warning(f"⚠️ Missing KvK/VAT for {filename}. Orchestrator deciding to use OCR Tool...")
                 
                 # Construct path to the source PDF
-                pdf_path = Path(f"data/invoices/{filename}") 
+                pdf_path = self.invoice_dir / filename
                 
                 if pdf_path.exists():
-                    print(f"   🛠️ Tool: Running Google Vision OCR on {filename}...")
-                    ocr_text = run_pdf_ocr_google(pdf_path)
+                    logger.info(f"   🛠️ Tool: Running Google Vision OCR on {filename}...")
+                    # The batcher groups concurrent OCR requests into one Vision batch call and
+                    # runs it in a worker thread, so other invoices keep progressing meanwhile.
+                    # Results are cached per PDF content hash, so reruns skip the Vision call.
+                    ocr_text = await self.ocr_batcher.run(pdf_path)
                     
                     if ocr_text:
                         # --- OBSERVABILITY ---
-                        ocr_out_dir = Path("data/llm_ready/ocr_texts")
-                        ocr_out_dir.mkdir(exist_ok=True, parents=True)
-                        ocr_file = ocr_out_dir / filename.replace(".pdf", "_ocr.txt")
+                        ocr_file = self.ocr_out_dir / f"{Path(filename).stem}_ocr.txt"
                         
-                        with open(ocr_file, "w", encoding="utf-8") as f:
-                            f.write(ocr_text)
-                        print(f"   💾 Saved OCR dump to: {ocr_file.name}")
+                        # Write off the event loop so concurrent invoices are not stalled.
+                        await asyncio.to_thread(ocr_file.write_text, ocr_text, encoding="utf-8")
+                        logger.info(f"   💾 Saved OCR dump to: {ocr_file.name}")
                         # -----------------------------------------
 
-                        print(f"   ✅ Tool Output: OCR extracted {len(ocr_text)} characters.")
+                        logger.info(f"   ✅ Tool Output: OCR extracted {len(ocr_text)} characters.")
                         
                         # =========================================================
                         # TIER 1: DETERMINISTIC REGEX EXTRACTION (FAST & CHEAP)
                         # =========================================================
-                        print("   ⚡ Orchestrator: Attempting Regex extraction first...")
+                        logger.info("   ⚡ Orchestrator: Attempting Regex extraction first...")
                         
                         regex_data = InvoiceRegexExtractor.extract_header_fields(ocr_text)
                         
                         if regex_data['kvkNumber'] and not header_res.invoiceHeader.kvkNumber:
                             header_res.invoiceHeader.kvkNumber = regex_data['kvkNumber']
-                            print(f"   🎯 REGEX SUCCESS: Found KvK {header_res.invoiceHeader.kvkNumber}")
+                            logger.info(f"   🎯 REGEX SUCCESS: Found KvK {header_res.invoiceHeader.kvkNumber}")
                         
                         if regex_data['vatNumber'] and not header_res.invoiceHeader.vatNumber:
                             header_res.invoiceHeader.vatNumber = regex_data['vatNumber']
-                            print(f"   🎯 REGEX SUCCESS: Found VAT {header_res.invoiceHeader.vatNumber}")
+                            logger.info(f"   🎯 REGEX SUCCESS: Found VAT {header_res.invoiceHeader.vatNumber}")
 
                         # =========================================================
                         # TIER 2: LLM FALLBACK (SMART BUT SLOWER)
@@ -394,55 +739,28 @@ class InvoiceOrchestrator:
                         missing_vat = not header_res.invoiceHeader.vatNumber
                         
                         if missing_kvk or missing_vat:
-                            print("   🤔 Regex couldn't find everything. Falling back to LLM extraction on OCR text...")
-                            
-                            ocr_prompt = f"""
-                            TASK: RECOVER MISSING DATA (SELF-CORRECTION)
+                            logger.info("   🤔 Regex couldn't find everything. Falling back to LLM extraction on OCR text...")
                             
-                            Previous attempts (Text & Regex) failed to find:
-                            {'- KvK Number' if missing_kvk else ''}
-                            {'- VAT Number' if missing_vat else ''}
+                            ocr_prompt = get_recovery_prompt(ocr_text, missing_kvk, missing_vat)
                             
-                            --- BEGIN OCR TEXT ---
-                            {ocr_text}
-                            --- END OCR TEXT ---
+                            recovered = await self._run_agent(self._header_runner, ocr_prompt, RecoveryResult)
                             
-                            INSTRUCTIONS:
-                            1. Search the OCR text specifically for 'KvK' or 'BTW' numbers.
-                            2. Sometimes OCR adds spaces (e.g. "84 72 61 80"). Try to reconstruct it.
-                            3. Return the COMPLETE invoiceHeader JSON. Use existing values where possible, but fill in the blanks using the OCR text.
-                            
-                            OUTPUT SCHEMA:
-                            {{
-                            "invoiceHeader": {{
-                                "supplierName": "{header_res.invoiceHeader.supplierName}",
-                                "invoiceNumber": "{header_res.invoiceHeader.invoiceNumber}",
-                                "invoiceDate": "{header_res.invoiceHeader.invoiceDate}",
-                                "kvkNumber": "string | null",
-                                "vatNumber": "string | null"
-                            }},
-                            "isCoachingInvoice": {str(header_res.isCoachingInvoice).lower()}
-                            }}
-                            """
-                            
-                            new_header_res = await self._run_agent(header_agent, ocr_prompt, HeaderResult)
-                            
-                            if new_header_res:
-                                if new_header_res.invoiceHeader.kvkNumber:
-                                    header_res.invoiceHeader.kvkNumber = new_header_res.invoiceHeader.kvkNumber
-                                    print(f"   ✨ LLM FIXED: KvK found: {new_header_res.invoiceHeader.kvkNumber}")
-                                if new_header_res.invoiceHeader.vatNumber:
-                                    header_res.invoiceHeader.vatNumber = new_header_res.invoiceHeader.vatNumber
-                                    print(f"   ✨ LLM FIXED: VAT found: {new_header_res.invoiceHeader.vatNumber}")
+                            if recovered:
+                                if missing_kvk and recovered.kvkNumber:
+                                    header_res.invoiceHeader.kvkNumber = recovered.kvkNumber
+                                    logger.info(f"   ✨ LLM FIXED: KvK found: {recovered.kvkNumber}")
+                                if missing_vat and recovered.vatNumber:
+                                    header_res.invoiceHeader.vatNumber = recovered.vatNumber
+                                    logger.info(f"   ✨ LLM FIXED: VAT found: {recovered.vatNumber}")
                         else:
-                            print("   🚀 Skipping LLM fallback (Regex found everything needed).")
+                            logger.info("   🚀 Skipping LLM fallback (Regex found everything needed).")
 
                 else:
-                    print(f"   ❌ Could not find PDF at {pdf_path} to run OCR.")
+                    logger.error(f"   ❌ Could not find PDF at {pdf_path} to run OCR.")
             # --- END TOOL USE ---
 
             if not lines_res:
-                print(f"⚠️ LineItem Agent failed for {filename}")
+                logger.warning(f"⚠️ LineItem Agent failed for {filename}")
                 lines_res = LineItemsResult()
             else:
                 lines_res = self._post_process_line_items(lines_res)
@@ -454,13 +772,11 @@ class InvoiceOrchestrator:
                 clientCasesNoActivity=lines_res.clientCasesNoActivity
             )
 
-            # --- APPLY CORRECTIONS (125 -> I25) ---
-            # Dit zet de typo's die de agent heeft gevonden om naar geldige database codes
-            final_result = apply_client_case_corrections(final_result, correction_map)
-            # --------------------------------------
-
-            # Post-processing enforcement (Business Logic - Strict Validation op CORRECTE codes)
-            final_result = enforce_allowed_client_cases(final_result, valid_allowed_cases)
+            # --- APPLY CORRECTIONS (125 -> I25) + ENFORCE ---
+            # Dit zet de typo's die de agent heeft gevonden om naar geldige database codes,
+            # and in the same pass drops every code that is not on the allowed list
+            # (Business Logic - Strict Validation op CORRECTE codes)
+            final_result = correct_and_enforce_client_cases(final_result, correction_map, valid_allowed_cases)
             
             return final_result
  
@@ -468,20 +784,23 @@ class InvoiceOrchestrator:
             """
             Cleans up line items.
             Moves cases with 0 hours or None duration to the 'NoActivity' list.
+
+            The 'NoActivity' list is deduplicated in insertion order; the final sort happens
+            once in `correct_and_enforce_client_cases`, after the case-code corrections.
             """
             cleaned_active = []
-            no_activity_set = set(lines_result.clientCasesNoActivity)
+            no_activity = dict.fromkeys(lines_result.clientCasesNoActivity)
 
             for case in lines_result.clientCases:
                 if case.durationHours is None or case.durationHours == 0:
                     # UPDATE: Check validatedClientCaseNumber instead of clientCaseNumber
                     if case.validatedClientCaseNumber:
-                        no_activity_set.add(case.validatedClientCaseNumber)
+                        no_activity[case.validatedClientCaseNumber] = None
                 else:
                     cleaned_active.append(case)
             
             lines_result.clientCases = cleaned_active
-            lines_result.clientCasesNoActivity = sorted(list(no_activity_set))
+            lines_result.clientCasesNoActivity = list(no_activity)
             return lines_result
     
 # --- Main Execution ---
@@ -493,45 +812,60 @@ async def main():
 
     from utils import load_all_coaching_invoices
     
-    print("📂 Loading invoices...")
+    logger.info("📂 Loading invoices...")
     examples = load_all_coaching_invoices(base_dir)
     
     if not examples:
-        print("No invoices found to process.")
+        logger.info("No invoices found to process.")
         return
 
-    orchestrator = InvoiceOrchestrator()
-    
-    success_count = 0
-    
-    total_invoices = len(examples)
-    
-    for index, example in enumerate(examples):
-        filename = example['filename']
-        print(f"\nProcessing: {filename}")
-        
-        result = await orchestrator.process_invoice(example)
-        
-        if result:
-            out_path = output_dir / filename.replace(".pdf", "_parsed.json")
-            with open(out_path, "w", encoding="utf-8") as f:
-                f.write(result.model_dump_json(indent=2))
-            print(f"✅ Success! Saved to {out_path.name}")
-            print(f"   Supplier: {result.invoiceHeader.supplierName}")
-            print(f"   Cases Found: {len(result.clientCases)}")
-            success_count += 1
-        else:
-            print("❌ Failed to process.")
-
-        # Smart Rate Limit: Only sleep if there are more items to process
-        if index < total_invoices - 1:
-            print("   💤 Cooling down for 10s to avoid Rate Limit...")
-            await asyncio.sleep(10)
-        else:
-            print("   🚀 Batch complete. Skipping final cooldown.")
-            
+    orchestrator = InvoiceOrchestrator(invoice_dir=Path("data/invoices"), output_dir=base_dir)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_INVOICES)
+
+    async def worker(example: Dict[str, Any]) -> bool:
+        """Processes one invoice under the concurrency cap and saves its JSON output."""
+        async with semaphore:
+            filename = example['filename']
+            logger.info(f"\nProcessing: {filename}")
+
+            try:
+                async with asyncio.timeout(INVOICE_TIMEOUT_SECONDS):
+                    result = await orchestrator.process_invoice(example)
+            except TimeoutError:
+                logger.error(f"❌ Timed out after {INVOICE_TIMEOUT_SECONDS}s while processing {filename}.")
+                return False
+
+            if result:
+                out_path = output_dir / f"{Path(filename).stem}_parsed.json"
+                payload = orjson.dumps(result.model_dump(mode="json"), option=orjson.OPT_INDENT_2)
+                await asyncio.to_thread(out_path.write_bytes, payload)
+                # One record per invoice keeps the summary together under concurrency
+                logger.info(
+                    f"✅ Success! Saved to {out_path.name}\n"
+                    f"   Supplier: {result.invoiceHeader.supplierName}\n"
+                    f"   Cases Found: {len(result.clientCases)}"
+                )
+                return True
+
+            logger.error(f"❌ Failed to process {filename}.")
+            return False
+
+    # No fixed cooldown between invoices: the shared RateLimiter throttles the
+    # API calls themselves and backs off as soon as a 429/503 is observed.
+    outcomes = await asyncio.gather(*(worker(e) for e in examples), return_exceptions=True)
+
+    for example, outcome in zip(examples, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"❌ Unexpected error while processing {example['filename']}: {outcome}")
+
+    success_count = sum(1 for outcome in outcomes if outcome is True)
+    logger.info(f"\n🚀 Batch complete. {success_count}/{len(examples)} invoices processed successfully.")
 
     await asyncio.sleep(0.5)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    log_listener = start_log_listener()
+    try:
+        asyncio.run(main())
+    finally:
+        log_listener.stop()
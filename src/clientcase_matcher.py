@@ -19,6 +19,7 @@ It is the core component responsible for the **Data Quality Gatekeeper** pattern
 Key Features:
 - **Exact Matching:** Verifies if a code exists directly in the database.
 - **Fuzzy Correction:** Automatically detects and fixes common OCR errors (e.g., swapping '1' for 'I' or '0' for 'O') based on the canonical format.
+- **OCR Edit Recovery:** Single look-alike substitutions (5/S, 8/B, 2/Z, 6/G) or a dropped/extra hyphen, at lower confidence.
 - **Ambiguity Detection:** Flags codes that could match multiple valid entries as ambiguous to prevent incorrect assignments.
 
 Classes:
@@ -27,27 +28,49 @@ Classes:
 """
 from __future__ import annotations
 
+from collections import OrderedDict
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Literal
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Literal
 import csv
-
-MatchStatus = Literal["exact", "fuzzy_io_swap", "ambiguous_io_swap", "unknown"]
+import sys
+
+# Registries at least this large are read with pyarrow (if installed); below this,
+# the import cost of pyarrow outweighs the parsing gain.
+PYARROW_MIN_BYTES = 1_000_000
+
+# OCR swaps normalized by canonical_case_number: I -> 1, O -> 0
+_CANON_SWAP = str.maketrans("IO", "10")
+
+# Letter/digit look-alikes OCR confuses beyond I/1 and O/0 (used by the single-edit tier).
+# Digit-to-digit confusions are deliberately absent: with numeric case numbers they would
+# "correct" a genuinely unknown code (e.g. 666) into a different, registered one.
+OCR_CONFUSIONS: Dict[str, str] = {
+    "S": "5", "5": "S",
+    "B": "8", "8": "B",
+    "Z": "2", "2": "Z",
+    "G": "6", "6": "G",
+    "L": "1", "D": "0", "Q": "0",
+}
+
+MatchStatus = Literal["exact", "fuzzy_io_swap", "fuzzy_edit1", "ambiguous_io_swap", "unknown"]
 Contamination = Literal["none", "I_only", "O_only", "I_and_O"]
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class MatchResult:
     """
     Data model representing the outcome of a client case number lookup.
 
+    Frozen (and slotted), so one instance can safely be shared by the match cache.
+
     Attributes:
         original_code (str): The raw string found on the invoice.
         matched_code (Optional[str]): The official code from the database if a match was found, else None.
         match_status (MatchStatus): The verdict of the matching process (e.g., 'exact', 'fuzzy_io_swap').
         match_confidence (float): A score (0.0 - 1.0) indicating certainty.
         contamination (Contamination): Flags if the original code contained 'I' or 'O' characters (often OCR noise).
-        candidates (List[str]): List of potential valid codes if multiple matches were found (for debugging).
+        candidates (Tuple[str, ...]): Potential valid codes if multiple matches were found (for debugging).
         notes (Optional[str]): Debugging information or reason for rejection.
     """
     original_code: str
@@ -55,7 +78,7 @@ class MatchResult:
     match_status: MatchStatus
     match_confidence: float
     contamination: Contamination         # based on matched_code (or original if no match)
-    candidates: List[str]                # all possible matches for fuzzy/ambiguous cases
+    candidates: Tuple[str, ...]          # all possible matches for fuzzy/ambiguous cases
     notes: Optional[str] = None
 
 
@@ -70,21 +93,25 @@ class ClientCaseMatcher:
 
     Attributes:
         index_csv_path (Path): Path to the CSV file containing valid codes.
-        valid_codes (Set[str]): A set of all valid codes for O(1) fast lookup.
-        index_by_canon (Dict[str, List[str]]): A lookup map where keys are 'canonical' (normalized) codes
-                                              and values are lists of actual valid codes.
+        valid_codes (FrozenSet[str]): A frozen set of all valid codes for O(1) fast lookup.
+        index_by_canon (Dict[str, Tuple[str, ...]]): A lookup map where keys are 'canonical' (normalized) codes
+                                                     and values are tuples of actual valid codes.
+        cache_size (int): Maximum number of raw codes whose MatchResult is memoized (LRU).
     """
 
-    def __init__(self, index_csv_path: Path):
+    def __init__(self, index_csv_path: Path, cache_size: int = 1024):
         """
         Initializes the matcher by loading the reference index into memory.
 
         Args:
             index_csv_path (Path): Path to the 'valid_clientcasenumbers.csv' file.
+            cache_size (int): Size of the LRU cache for repeated codes (one client → many invoices).
         """
         self.index_csv_path = index_csv_path
-        self.valid_codes: Set[str] = set()
-        self.index_by_canon: Dict[str, List[str]] = {}
+        self.valid_codes: FrozenSet[str] = frozenset()
+        self.index_by_canon: Dict[str, Tuple[str, ...]] = {}
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, MatchResult]" = OrderedDict()
         self._load_index()
 
     # ---------- loading & indexing ----------
@@ -103,23 +130,76 @@ class ClientCaseMatcher:
             raise FileNotFoundError(f"Clientcase index not found: {self.index_csv_path}")
 
         with self.index_csv_path.open(newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            # We expect a 'clientCaseNumber' column
-            col = "clientCaseNumber"
-            if reader.fieldnames is None or col not in reader.fieldnames:
-                # fallback: take the first column
-                header = reader.fieldnames or []
-                if not header:
-                    raise ValueError(f"No columns found in clientcase index: {self.index_csv_path}")
-                col = header[0]
-
-            for row in reader:
-                code = (row.get(col) or "").strip()
-                if not code:
-                    continue
-                self.valid_codes.add(code)
-                canon = self.canonical_case_number(code)
-                self.index_by_canon.setdefault(canon, []).append(code)
+            header = next(csv.reader(f), None)
+        # We expect a 'clientCaseNumber' column
+        col = "clientCaseNumber"
+        if not header or col not in header:
+            # fallback: take the first column
+            if not header:
+                raise ValueError(f"No columns found in clientcase index: {self.index_csv_path}")
+            col = header[0]
+
+        codes = None
+        if self.index_csv_path.stat().st_size >= PYARROW_MIN_BYTES:
+            codes = self._read_column_pyarrow(col)
+        if codes is None:
+            codes = self._read_column_csv(col)
+
+        valid: Set[str] = set()
+        groups: Dict[str, List[str]] = {}
+        for raw in codes:
+            # Interned: every code/key is stored once and shared by the set, the index and results
+            code = sys.intern((raw or "").strip())
+            if not code:
+                continue
+            valid.add(code)
+            canon = sys.intern(self.canonical_case_number(code))
+            groups.setdefault(canon, []).append(code)
+
+        # The registry is read-only after loading: freeze the set and the groups
+        # (exact-size tuples instead of over-allocated lists).
+        self.valid_codes = frozenset(valid)
+        self.index_by_canon = {canon: tuple(group) for canon, group in groups.items()}
+
+    def _read_column_csv(self, col: str) -> List[str]:
+        """
+        Reads one column with the standard library `csv` module.
+
+        Uses a plain `csv.reader` indexed by position (no per-row dict as with DictReader);
+        blank and too-short rows are skipped.
+        """
+        with self.index_csv_path.open(newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            col_idx = next(reader, []).index(col)
+            return [row[col_idx] for row in reader if col_idx < len(row)]
+
+    def _read_column_pyarrow(self, col: str) -> Optional[List[str]]:
+        """
+        Reads one column with pyarrow's multithreaded CSV reader (large registries only).
+
+        Returns:
+            Optional[List[str]]: The column values, or None if pyarrow is not installed
+                                 or cannot parse the file (the caller then uses `csv`).
+        """
+        try:
+            import pyarrow as pa
+            from pyarrow import csv as pacsv
+        except ImportError:
+            return None
+
+        try:
+            table = pacsv.read_csv(
+                str(self.index_csv_path),
+                convert_options=pacsv.ConvertOptions(
+                    include_columns=[col],
+                    column_types={col: pa.string()},
+                    strings_can_be_null=False,
+                ),
+            )
+        except pa.ArrowException as e:
+            print(f"⚠️ pyarrow could not read {self.index_csv_path.name} ({e}); using csv instead.")
+            return None
+        return table.column(col).to_pylist()
 
     # ---------- canonical helpers ----------
 
@@ -129,7 +209,7 @@ class ClientCaseMatcher:
         Converts a code to its 'canonical' form by normalizing ambiguous characters.
         
         Logic:
-        - Swaps 'I' -> '1' and 'O' -> '0' at these positions to handle OCR misinterpretations.
+        - Swaps 'I' -> '1' and 'O' -> '0' at positions 3 and 10-12 to handle OCR misinterpretations.
         - Other positions are left untouched.
 
         Args:
@@ -142,18 +222,12 @@ class ClientCaseMatcher:
         if len(c) < 11:
             # Leave it to later validation to decide this is wrong
             return c
+        if "I" not in c and "O" not in c:
+            # Nothing to swap: the upper-cased code already is its canonical form
+            return c
 
-        chars = list(c)
-        letter_positions = [3, 10, 11, 12]
-
-        for pos in letter_positions:
-            if pos < len(chars):
-                if chars[pos] == "I":
-                    chars[pos] = "1"
-                elif chars[pos] == "O":
-                    chars[pos] = "0"
-
-        return "".join(chars)
+        # Letter positions 3 and 10-12: translate just those slices, keep the rest as-is
+        return c[:3] + c[3].translate(_CANON_SWAP) + c[4:10] + c[10:13].translate(_CANON_SWAP) + c[13:]
 
     @staticmethod
     def contamination_flag(code: str) -> Contamination:
@@ -182,6 +256,33 @@ class ClientCaseMatcher:
     # ---------- matching API ----------
 
     def match(self, code: str) -> MatchResult:
+        """
+        Memoized entry point for `_match_impl`.
+
+        The registry does not change after loading, so the result for a given raw code
+        is cached (LRU, `cache_size` entries). The cache key is the stripped code, which
+        is all `_match_impl` looks at; case is kept, since exact matching is case-sensitive.
+        MatchResult is frozen, so repeated codes safely share the same instance.
+
+        Args:
+            code (str): The raw string found on the invoice.
+
+        Returns:
+            MatchResult: Object containing the best match, status, and metadata.
+        """
+        key = (code or "").strip()
+        hit = self._cache.get(key)
+        if hit is not None:
+            self._cache.move_to_end(key)
+            return hit
+
+        result = self._match_impl(key)
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def _match_impl(self, code: str) -> MatchResult:
         """
         The core logic: Attempts to match a raw input string to a valid client case number.
 
@@ -189,7 +290,8 @@ class ClientCaseMatcher:
         1. **Exact Match:** If the code exists in the DB as-is -> 'exact'.
         2. **Fuzzy Match:** If the canonical form matches exactly one valid code -> 'fuzzy_io_swap'.
         3. **Ambiguous:** If the canonical form matches multiple valid codes -> 'ambiguous_io_swap'.
-        4. **Unknown:** If no match is found -> 'unknown'.
+        4. **OCR Edit:** If exactly one valid code is a single look-alike/hyphen edit away -> 'fuzzy_edit1'.
+        5. **Unknown:** If no match is found -> 'unknown'.
 
         Args:
             code (str): The raw string found on the invoice (e.g. "JN16-121-284").
@@ -205,7 +307,7 @@ class ClientCaseMatcher:
                 match_status="unknown",
                 match_confidence=0.0,
                 contamination="none",
-                candidates=[],
+                candidates=(),
                 notes="Empty or whitespace-only clientCaseNumber",
             )
 
@@ -217,23 +319,37 @@ class ClientCaseMatcher:
                 match_status="exact",
                 match_confidence=1.0,
                 contamination=self.contamination_flag(original),
-                candidates=[original],
+                candidates=(original,),
                 notes=None,
             )
 
         # 2) Canonical match
         canon = self.canonical_case_number(original)
-        candidates = self.index_by_canon.get(canon, [])
+        candidates = self.index_by_canon.get(canon, ())
 
         if not candidates:
-            # No matches
+            # 3) Single OCR edit (look-alike substitution or hyphen dropped/added)
+            edit_candidates = self._single_edit_candidates(canon)
+            if len(edit_candidates) == 1:
+                matched = edit_candidates[0]
+                return MatchResult(
+                    original_code=original,
+                    matched_code=matched,
+                    match_status="fuzzy_edit1",
+                    match_confidence=0.5,
+                    contamination=self.contamination_flag(matched),
+                    candidates=edit_candidates,
+                    notes="Matched via a single OCR look-alike or hyphen edit",
+                )
+
+            # No matches (or several equally close ones)
             return MatchResult(
                 original_code=original,
                 matched_code=None,
                 match_status="unknown",
                 match_confidence=0.0,
                 contamination=self.contamination_flag(original),
-                candidates=[],
+                candidates=edit_candidates,
                 notes="clientCaseNumber is not registered",
             )
 
@@ -260,3 +376,51 @@ class ClientCaseMatcher:
             candidates=candidates,
             notes="Multiple possible matches for canonical form",
         )
+
+    def match_many(self, codes: Iterable[str]) -> Dict[str, MatchResult]:
+        """
+        Matches a batch of raw codes, resolving each distinct code only once.
+
+        Args:
+            codes (Iterable[str]): Raw strings found on one or more invoices.
+
+        Returns:
+            Dict[str, MatchResult]: One result per distinct input code, in first-seen order.
+        """
+        results: Dict[str, MatchResult] = {}
+        for code in codes:
+            if code not in results:
+                results[code] = self.match(code)
+        return results
+
+    def _single_edit_candidates(self, canon: str) -> Tuple[str, ...]:
+        """
+        Finds valid codes exactly one OCR edit away from a canonical code.
+
+        Instead of a Levenshtein automaton over the whole registry, the (small) set of
+        neighbours of the query is generated and probed in `index_by_canon`:
+        one OCR_CONFUSIONS substitution, one dropped hyphen, or one inserted hyphen.
+        Each neighbour is re-canonicalized, since a hyphen edit shifts the swap positions.
+
+        Args:
+            canon (str): The canonical form of the code that missed the index.
+
+        Returns:
+            Tuple[str, ...]: Distinct valid codes reachable with one edit (usually 0 or 1).
+        """
+        neighbours = []
+        for i, ch in enumerate(canon):
+            alt = OCR_CONFUSIONS.get(ch)
+            if alt:
+                neighbours.append(canon[:i] + alt + canon[i + 1:])
+            if ch == "-":
+                neighbours.append(canon[:i] + canon[i + 1:])
+        for i in range(1, len(canon)):
+            if canon[i - 1] != "-" and canon[i] != "-":
+                neighbours.append(canon[:i] + "-" + canon[i:])
+
+        found: Dict[str, None] = {}
+        for neighbour in neighbours:
+            for code in self.index_by_canon.get(self.canonical_case_number(neighbour), ()):
+                found[code] = None
+        return tuple(found)
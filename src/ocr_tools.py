@@ -17,28 +17,80 @@ This module provides a wrapper around the **Google Cloud Vision API** to extract
 PDF documents that contain scanned images or complex layouts (where standard text extraction fails).
 
 It handles the full pipeline:
-1. Converting a PDF page to an image (using `pdf2image`).
+1. Converting a PDF page to a JPEG image (in-process with `pypdfium2`, or `pdf2image` as fallback).
 2. Sending the image to the Google Cloud Vision API.
 3. Returning the raw text detected in the image.
+4. Caching results per PDF content hash (`OcrCache`, in memory and on disk), so reruns skip the API call.
+5. Batching concurrent requests into `batch_annotate_images` calls (`OcrBatcher`).
 
 Dependencies:
     - `google-cloud-vision`: For the OCR API.
-    - `pdf2image` & `poppler`: For converting PDF pages to bytes.
+    - `pypdfium2` (installed with pdfplumber): Renders PDF pages in-process, no poppler needed.
+    - `pdf2image` & `poppler`: Fallback renderer when pypdfium2 is unavailable or fails.
     - If dependencies are missing, it gracefully falls back to a MOCK response for testing purposes.
 """
+import asyncio
+import contextlib
+import hashlib
 import io
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Set, Tuple
 
 # Probeer imports, faal vriendelijk als libraries missen
 try:
-    from google.cloud import vision
+    import pypdfium2 as pdfium
+    HAS_PDFIUM = True
+except ImportError:
+    HAS_PDFIUM = False
+
+try:
     from pdf2image import convert_from_path
-    HAS_DEPENDENCIES = True
+    HAS_PDF2IMAGE = True
+except ImportError:
+    HAS_PDF2IMAGE = False
+
+try:
+    from google.cloud import vision
+    HAS_DEPENDENCIES = HAS_PDFIUM or HAS_PDF2IMAGE
 except ImportError:
     HAS_DEPENDENCIES = False
-    print("⚠️ Warning: 'google-cloud-vision' or 'pdf2image' not installed. OCR will be mocked.")
+
+if not HAS_DEPENDENCIES:
+    print("⚠️ Warning: 'google-cloud-vision' or a PDF renderer (pypdfium2/pdf2image) not installed. OCR will be mocked.")
+
+# 150 DPI keeps small footer print (KvK/BTW) legible while the JPEG stays ~150 KB per page
+OCR_RENDER_DPI = 150
+OCR_JPEG_QUALITY = 90
+
+# Vision accepts at most 16 images per batch_annotate_images request
+VISION_BATCH_SIZE = 16
+
+# PDFium is not thread-safe, not even with one document per thread: every pypdfium2
+# call in this process goes through this lock (OcrBatcher may run batches concurrently)
+_PDFIUM_LOCK = threading.Lock()
+
+# One Vision client per process: creating it loads credentials and opens a gRPC channel
+_VISION_CLIENT: Optional["vision.ImageAnnotatorClient"] = None
+_VISION_CLIENT_LOCK = threading.Lock()
+
+
+def _get_vision_client() -> "vision.ImageAnnotatorClient":
+    """Returns the shared Vision client, creating it on first use (thread-safe)."""
+    global _VISION_CLIENT
+    if _VISION_CLIENT is None:
+        with _VISION_CLIENT_LOCK:
+            if _VISION_CLIENT is None:
+                _VISION_CLIENT = vision.ImageAnnotatorClient()
+    return _VISION_CLIENT
+
+
+if HAS_DEPENDENCIES:
+    _TEXT_DETECTION = vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)
+
 
 def run_pdf_ocr_google(pdf_path: Path) -> str:
     """
@@ -55,38 +107,261 @@ def run_pdf_ocr_google(pdf_path: Path) -> str:
              Returns an empty string if the process fails.
              Returns a specific mock string if dependencies are not installed.
     """
+    return run_pdf_ocr_google_batch([pdf_path])[0]
+
+
+def run_pdf_ocr_google_batch(pdf_paths: List[Path]) -> List[str]:
+    """
+    Batch variant of `run_pdf_ocr_google`: OCRs the first page of several PDFs.
+
+    Pages are rendered one after another (PDFium is not thread-safe) and sent to Vision in
+    `batch_annotate_images` requests of up to VISION_BATCH_SIZE images, so N PDFs cost
+    ceil(N / 16) round-trips; several requests are sent in parallel threads.
+
+    Args:
+        pdf_paths (List[Path]): The PDF documents to read.
+
+    Returns:
+        List[str]: One text per input path, in input order ("" where rendering or OCR failed).
+    """
     if not HAS_DEPENDENCIES:
-        return "[MOCK OCR RESULT] KvK nummer: 84726180 BTW Nr: NL863334647B01"
+        return ["[MOCK OCR RESULT] KvK nummer: 84726180 BTW Nr: NL863334647B01"] * len(pdf_paths)
+    if not pdf_paths:
+        return []
 
-    # 1. Convert PDF to Image (First page is usually enough for Header info)
+    # 1. Convert PDFs to images (first page is usually enough for Header info)
+    blobs = [_render_first_page(pdf_path) for pdf_path in pdf_paths]
+
+    # 2. Call Google Vision API for the pages that rendered (network-bound: chunks in parallel)
+    texts = [""] * len(pdf_paths)
+    todo = [(i, content) for i, content in enumerate(blobs) if content]
+    chunks = [todo[start:start + VISION_BATCH_SIZE] for start in range(0, len(todo), VISION_BATCH_SIZE)]
+    if not chunks:
+        return texts
+    with ThreadPoolExecutor(max_workers=min(4, len(chunks))) as pool:
+        responses = list(pool.map(_annotate_chunk, chunks))
+
+    for chunk, response in zip(chunks, responses):
+        if response is None:
+            # Fallback for demo purposes if API fails (e.g. auth issues)
+            continue
+
+        for (i, _), result in zip(chunk, response.responses):
+            if result.error.message:
+                print(f"❌ Google Vision API failed for {pdf_paths[i].name}: {result.error.message}")
+            elif result.text_annotations:
+                # text_annotations[0].description contains the full text block
+                texts[i] = result.text_annotations[0].description
+    return texts
+
+
+def _annotate_chunk(chunk: List[Tuple[int, bytes]]):
+    """Sends one batch_annotate_images request; returns None (after logging) if the call fails."""
     try:
-        images = convert_from_path(str(pdf_path), first_page=1, last_page=1)
-        if not images:
-            return ""
-        
-        # Convert PIL image to bytes
-        img_byte_arr = io.BytesIO()
-        images[0].save(img_byte_arr, format='PNG')
-        content = img_byte_arr.getvalue()
+        return _get_vision_client().batch_annotate_images(requests=[
+            vision.AnnotateImageRequest(image=vision.Image(content=content), features=[_TEXT_DETECTION])
+            for _, content in chunk
+        ])
     except Exception as e:
-        print(f"❌ PDF to Image failed: {e}")
-        return ""
+        print(f"❌ Google Vision API failed: {e}")
+        return None
+
+
+def _render_first_page(pdf_path: Path) -> Optional[bytes]:
+    """Renders the first page of a PDF to JPEG bytes, or returns None on failure."""
+    if HAS_PDFIUM:
+        try:
+            with _PDFIUM_LOCK:
+                pdf = pdfium.PdfDocument(str(pdf_path))
+                try:
+                    image = pdf[0].render(scale=OCR_RENDER_DPI / 72).to_pil()
+                finally:
+                    pdf.close()
+            return _encode_jpeg(image)
+        except Exception as e:
+            if not HAS_PDF2IMAGE:
+                print(f"❌ PDF to Image failed: {e}")
+                return None
+            print(f"⚠️ pypdfium2 could not render {pdf_path.name} ({e}); trying pdf2image.")
 
-    # 2. Call Google Vision API
     try:
-        client = vision.ImageAnnotatorClient()
-        image = vision.Image(content=content)
-        
-        # Perform text detection
-        response = client.text_detection(image=image)
-        texts = response.text_annotations
-        
-        if texts:
-            # texts[0].description contains the full text block
-            return texts[0].description
-        return ""
-        
+        images = convert_from_path(str(pdf_path), dpi=OCR_RENDER_DPI, first_page=1, last_page=1)
+        if not images:
+            return None
+        return _encode_jpeg(images[0])
     except Exception as e:
-        print(f"❌ Google Vision API failed: {e}")
-        # Fallback for demo purposes if API fails (e.g. auth issues)
-        return ""
\ No newline at end of file
+        print(f"❌ PDF to Image failed: {e}")
+        return None
+
+
+def _encode_jpeg(image) -> bytes:
+    """Encodes a PIL image as JPEG; much smaller than PNG, so the Vision upload is faster."""
+    img_byte_arr = io.BytesIO()
+    image.convert("RGB").save(img_byte_arr, format='JPEG', quality=OCR_JPEG_QUALITY)
+    return img_byte_arr.getvalue()
+
+
+class OcrCache:
+    """
+    Persistent cache for OCR results, keyed by the SHA-256 of the PDF bytes.
+
+    Vision OCR is the slowest and only paid step of the self-correction path. Keying
+    on the file content (not the filename) means a rerun on the same PDF reuses the
+    earlier result, while a changed PDF with the same name is OCR'd again.
+
+    Results are also kept in a small in-process LRU, so repeated lookups within one
+    run skip the disk. Disk writes go through a temp file and `os.replace`, so a
+    concurrent reader never sees a half-written entry.
+
+    Attributes:
+        cache_dir (Path): Directory holding one `<sha256>.txt` file per PDF.
+            Can be overridden with the `OCR_CACHE_DIR` environment variable.
+        max_memory_entries (int): Size of the in-process LRU layer.
+    """
+
+    def __init__(self, cache_dir: Path, max_memory_entries: int = 256):
+        self.cache_dir = Path(os.getenv("OCR_CACHE_DIR", cache_dir)).expanduser()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def pdf_digest(pdf_path: Path) -> str:
+        """Returns the SHA-256 hex digest of the PDF file contents."""
+        return hashlib.sha256(pdf_path.read_bytes()).hexdigest()
+
+    def _remember(self, digest: str, text: str) -> None:
+        """Stores a result in the in-process LRU, evicting the oldest entry when full."""
+        with self._lock:
+            self._memory[digest] = text
+            self._memory.move_to_end(digest)
+            if len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def run(self, pdf_path: Path) -> str:
+        """
+        Returns the OCR text for `pdf_path`, calling Vision only on a cache miss.
+
+        Empty results and mock results (missing dependencies) are never cached.
+        """
+        return self.run_many([pdf_path])[0]
+
+    def run_many(self, pdf_paths: List[Path]) -> List[str]:
+        """
+        Returns the OCR texts for several PDFs, sending all cache misses to Vision in one batch.
+
+        Empty results and mock results (missing dependencies) are never cached.
+        """
+        texts: List[Optional[str]] = [None] * len(pdf_paths)
+        misses = []
+        for i, pdf_path in enumerate(pdf_paths):
+            digest = self.pdf_digest(pdf_path)
+            texts[i] = self._lookup(digest)
+            if texts[i] is None:
+                misses.append((i, digest))
+
+        if misses:
+            fresh = run_pdf_ocr_google_batch([pdf_paths[i] for i, _ in misses])
+            for (i, digest), text in zip(misses, fresh):
+                texts[i] = text
+                if text and HAS_DEPENDENCIES:
+                    self._store(digest, text)
+        return texts
+
+    def _lookup(self, digest: str) -> Optional[str]:
+        """Checks the in-process LRU first, then the disk cache."""
+        with self._lock:
+            text = self._memory.get(digest)
+            if text is not None:
+                self._memory.move_to_end(digest)
+                return text
+
+        cache_file = self.cache_dir / f"{digest}.txt"
+        try:
+            text = cache_file.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            # The cache is best-effort: an unreadable entry just means OCR runs again
+            print(f"⚠️ Could not read OCR cache entry {cache_file.name}: {e}")
+            return None
+        self._remember(digest, text)
+        return text
+
+    def _store(self, digest: str, text: str) -> None:
+        """
+        Writes a result to disk atomically (temp file + rename) and to the in-process LRU.
+        A failed disk write (read-only or full cache dir) only costs the disk cache.
+        """
+        cache_file = self.cache_dir / f"{digest}.txt"
+        tmp_file = cache_file.with_name(f"{digest}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp_file.write_text(text, encoding="utf-8")
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            print(f"⚠️ Could not write OCR cache entry {cache_file.name}: {e}")
+            with contextlib.suppress(OSError):
+                tmp_file.unlink()
+        self._remember(digest, text)
+
+
+class OcrBatcher:
+    """
+    Coalesces concurrent OCR requests from the async orchestrator into batched Vision calls.
+
+    Each `run()` call queues its PDF; the queue is flushed after `max_wait` seconds or as soon
+    as `max_batch` PDFs are waiting. A flush resolves the whole batch with one
+    `OcrCache.run_many` call in a worker thread, so the event loop is never blocked.
+
+    Attributes:
+        cache (OcrCache): The cache (and Vision backend) used for each batch.
+        max_batch (int): Flush immediately once this many PDFs are queued.
+        max_wait (float): Seconds to wait for more requests before flushing.
+    """
+
+    def __init__(self, cache: OcrCache, max_batch: int = VISION_BATCH_SIZE, max_wait: float = 0.2):
+        self.cache = cache
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending: List[Tuple[Path, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def run(self, pdf_path: Path) -> str:
+        """Queues `pdf_path` for the next batch and waits for its OCR text."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((pdf_path, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        """Starts a batch for everything queued so far."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[Path, asyncio.Future]]) -> None:
+        """
+        Runs one batch off the event loop and hands each waiter its result.
+        Like a failed Vision call, a failing batch resolves every waiter with "" (no OCR text),
+        so one error never fails the invoices that share the batch.
+        """
+        try:
+            texts = await asyncio.to_thread(self.cache.run_many, [pdf_path for pdf_path, _ in batch])
+        except Exception as e:
+            print(f"❌ OCR batch of {len(batch)} PDF(s) failed: {e}")
+            texts = [""] * len(batch)
+        for (_, future), text in zip(batch, texts):
+            # A waiter may have been cancelled (e.g. invoice timeout) in the meantime
+            if not future.done():
+                future.set_result(text)
@@ -21,14 +21,47 @@ Key Features:
 - **Robust Client Case Detection:** Uses a permissive pattern (`A-Z0-9`) to capture codes even if they contain OCR errors (like 1/I swaps).
 - **Multi-Format Support:** Handles various date formats (NL/ISO) and number formats (EU/US).
 - **VAT/KvK Validation:** Detects Dutch administrative numbers in various layouts.
+- **Compiled Once:** All patterns are compiled at import. Set `INVOICE_REGEX_ENGINE=ascii` for faster
+  ASCII-only scanning, or `INVOICE_REGEX_ENGINE=re2` (with `google-re2` installed) for linear-time scanning.
 
 Classes:
     InvoiceRegexExtractor: Static utility class containing patterns and helper methods.
 """
+import os
 import re
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 
+# Regex engine for PATTERNS, selected with INVOICE_REGEX_ENGINE:
+#   "re"    (default) Python's `re` with Unicode-aware \s, \w, \d and \b.
+#   "ascii" Python's `re` with re.ASCII: ~2.5x faster scans, ASCII-only classes.
+#   "re2"   google-re2 (if installed): linear-time DFA scans, ASCII-only classes.
+# With the ASCII-only engines, OCR text containing non-breaking spaces or accented
+# letters next to a match can give different results than the default engine.
+try:
+    import re2
+    HAS_RE2 = True
+except ImportError:
+    re2 = None
+    HAS_RE2 = False
+
+REGEX_ENGINE = os.getenv("INVOICE_REGEX_ENGINE", "re").lower()
+USE_RE2 = HAS_RE2 and REGEX_ENGINE == "re2"
+
+
+def _compile(pattern: str, flags: int = 0):
+    """Compiles a PATTERNS entry for the selected engine (RE2 falls back to `re` per pattern)."""
+    if USE_RE2:
+        inline = '(?i)' if flags & re.IGNORECASE and not pattern.startswith('(?i)') else ''
+        try:
+            return re2.compile(inline + pattern)
+        except re2.error:
+            pass
+    if REGEX_ENGINE == "ascii":
+        flags |= re.ASCII
+    return re.compile(pattern, flags)
+
+
 class InvoiceRegexExtractor:
     """
     Shared logic for extracting patterns from invoice text.
@@ -39,42 +72,67 @@ class InvoiceRegexExtractor:
     # --- PATTERNS ---
     PATTERNS = {
         'client_cases': [
-            re.compile(r'(?i)\b(DEM[O0]-CASE-[A-Z0-9-]+)\b'),
+            _compile(r'(?i)\b(DEM[O0]-CASE-[A-Z0-9-]+)\b'),
         ],
         'invoice_numbers': [
-            re.compile(r'(?i)\b(?:factuurnummer|factuur ?nr\.?|invoice.?number)\b[:\s]+([A-Z0-9./-]+)'),
-            re.compile(r'(?i)Factuurnummer:\s*\n(?:.*\n)?\s*([0-9]{3,})'),
-            re.compile(r'(?i)\bBetreft:\s*facturen?\s+(\d{3,})'),
-            re.compile(r'(?i)\b(?:ref|reference)\b[:\s#-]*([A-Z0-9./-]+)'),
-            re.compile(r'(?i)\bFact\.:\s*([A-Z0-9._-]+)')
+            _compile(r'(?i)\b(?:factuurnummer|factuur ?nr\.?|invoice.?number)\b[:\s]+([A-Z0-9./-]+)'),
+            _compile(r'(?i)Factuurnummer:\s*\n(?:.*\n)?\s*([0-9]{3,})'),
+            _compile(r'(?i)\bBetreft:\s*facturen?\s+(\d{3,})'),
+            _compile(r'(?i)\b(?:ref|reference)\b[:\s#-]*([A-Z0-9./-]+)'),
+            _compile(r'(?i)\bFact\.:\s*([A-Z0-9._-]+)')
         ],
         'dates': [
-            re.compile(r'\b(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})\b'),
-            re.compile(r'\b(\d{1,2}\s+\w+\s+\d{4})\b'),
-            re.compile(r'\b(\d{4}[-/]\d{1,2}[-/]\d{1,2})\b'),
+            _compile(r'\b(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})\b'),
+            _compile(r'\b(\d{1,2}\s+\w+\s+\d{4})\b'),
+            _compile(r'\b(\d{4}[-/]\d{1,2}[-/]\d{1,2})\b'),
         ],
         'amounts': [
-            re.compile(r'€\s*([\d.,]+)'),
-            re.compile(r'EUR\s*([\d.,]+)'),
-            re.compile(r'\$\s*([\d.,]+)'),
-            re.compile(r'(?:total|totaal|amount|bedrag)[:\s]*(?:€|\$|EUR)?\s*([\d.,]+)', re.IGNORECASE),
+            _compile(r'€\s*([\d.,]+)'),
+            _compile(r'EUR\s*([\d.,]+)'),
+            _compile(r'\$\s*([\d.,]+)'),
+            _compile(r'(?:total|totaal|amount|bedrag)[:\s]*(?:€|\$|EUR)?\s*([\d.,]+)', re.IGNORECASE),
         ],
         'emails': [
-            re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'),
+            _compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'),
         ],
         'vat_numbers': [
-            re.compile(r'\b(NL\s*(?:\d[.\s]?){9}B\.?\s*\d{2})\b', re.IGNORECASE),
-            re.compile(r'(?i)\b(?:btw|omzetbelastingnummer|ob-nummer|ob nummer)\b.*?(\d{9}\s*B\s*\d{2})'),
-            re.compile(r'(?i)(?:btw(?:-id)?|btw ?nr\.?|vat(?: ?id)?|tax(?: ?id)?)[:\s#-]*([A-Z0-9.\-]+)'),
+            _compile(r'\b(NL\s*(?:\d[.\s]?){9}B\.?\s*\d{2})\b', re.IGNORECASE),
+            _compile(r'(?i)\b(?:btw|omzetbelastingnummer|ob-nummer|ob nummer)\b.*?(\d{9}\s*B\s*\d{2})'),
+            _compile(r'(?i)(?:btw(?:-id)?|btw ?nr\.?|vat(?: ?id)?|tax(?: ?id)?)[:\s#-]*([A-Z0-9.\-]+)'),
         ],
         'kvk_numbers': [
-            re.compile(r'(?i)\bkvk(?:[-\s]?nummer|nr\.?)?(?:\s+\w+)?[:\s#-]*([0-9]{7,8})'),
-            re.compile(r'(?i)kvk.*?(\d{8})'), 
+            _compile(r'(?i)\bkvk(?:[-\s]?nummer|nr\.?)?(?:\s+\w+)?[:\s#-]*([0-9]{7,8})'),
+            _compile(r'(?i)kvk.*?(\d{8})'), 
         ],
     }
 
+    # --- PREFILTER LITERALS ---
+    # A category can only match when at least one of its keywords occurs in the
+    # case-folded text, so its full scans are skipped otherwise. Categories
+    # without an entry (dates) are always scanned.
+    PREFILTERS = {
+        'client_cases': ('-case-',),
+        'invoice_numbers': ('fact', 'invoice', 'ref'),
+        'amounts': ('€', 'eur', '$', 'tota', 'amount', 'bedrag'),
+        'emails': ('@',),
+        'vat_numbers': ('nl', 'btw', 'omzetbelasting', 'ob-nummer', 'ob nummer', 'vat', 'tax'),
+        'kvk_numbers': ('kvk',),
+    }
+
     VAT_NL_CANON = re.compile(r'^NL\d{9}B\d{2}$', re.IGNORECASE)
     VAT_EU_GENERIC = re.compile(r'^[A-Z]{2}\d{8,12}$')
+
+    # --- NORMALIZATION HELPERS (compiled once, used per match) ---
+    VAT_SEPARATORS = re.compile(r'[\s.\-]')
+    VAT_LABEL_PREFIX = re.compile(r'^(BTWID|BTWNR|BTW|VATID|VATNR|VAT|TAXID|TAXNR|TAX)')
+    # Amount separator tables: EU drops '.' thousands and makes ',' the decimal point, US drops ','
+    AMOUNT_EU = str.maketrans({'.': None, ',': '.'})
+    AMOUNT_US = str.maketrans({',': None})
+    # Numeric dates, mirroring what strptime accepted for "%d-%m-%Y"/"%d-%m-%y" and "%Y-%m-%d"
+    # (either separator, used consistently; 4-digit or 2-digit year)
+    DATE_NUMERIC_DMY = re.compile(r"^(0?[1-9]|[12][0-9]|3[01])([-/])(0?[1-9]|1[0-2])\2([0-9]{4}|[0-9]{2})$")
+    DATE_NUMERIC_YMD = re.compile(r"^([0-9]{4})([-/])(0?[1-9]|1[0-2])\2(0?[1-9]|[12][0-9]|3[01]| [1-9])$")
+    DATE_DAY_MONTH_YEAR = re.compile(r"^\s*(\d{1,2})\s+([A-Za-z]+)\s+(\d{4})\s*$")
     
     MONTHS_NL = {
         "januari": 1, "februari": 2, "maart": 3, "april": 4, "mei": 5, "juni": 6,
@@ -94,10 +152,9 @@ class InvoiceRegexExtractor:
                             and values are lists of extracted, normalized data.
         """
         found = {}
-        for pattern_name, pattern_list in cls.PATTERNS.items():
-            matches = []
-            for pattern in pattern_list:
-                matches.extend(pattern.findall(text))
+        folded = text.casefold()
+        for pattern_name in cls.PATTERNS:
+            matches = cls._find(pattern_name, text, folded)
             
             if pattern_name == 'amounts':
                 found[pattern_name] = cls._parse_amounts(matches)
@@ -117,16 +174,38 @@ class InvoiceRegexExtractor:
         """
         Targeted extraction for the Orchestrator (Tier 1 Fallback).
         Returns the 'best guess' for critical header fields only.
+
+        Only the KvK, VAT and invoice number patterns are run; the date, amount
+        and client case scans of `extract_all` are not needed here.
         """
-        all_data = cls.extract_all(text)
+        folded = text.casefold()
+        kvk_numbers = cls._dedupe(cls._find('kvk_numbers', text, folded))
+        vat_numbers = cls._parse_vat(cls._find('vat_numbers', text, folded))
+        invoice_numbers = cls._dedupe(cls._find('invoice_numbers', text, folded))
         return {
-            "kvkNumber": all_data['kvk_numbers'][0] if all_data.get('kvk_numbers') else None,
-            "vatNumber": all_data['vat_numbers'][0] if all_data.get('vat_numbers') else None,
-            "invoiceNumber": all_data['invoice_numbers'][0] if all_data.get('invoice_numbers') else None,
+            "kvkNumber": kvk_numbers[0] if kvk_numbers else None,
+            "vatNumber": vat_numbers[0] if vat_numbers else None,
+            "invoiceNumber": invoice_numbers[0] if invoice_numbers else None,
         }
 
     # --- INTERNAL HELPERS ---
 
+    @classmethod
+    def _find(cls, pattern_name: str, text: str, folded: str) -> List[Any]:
+        """
+        Collects the raw matches of every compiled pattern in a PATTERNS group.
+
+        `folded` is `text.casefold()`, computed once by the caller and used for
+        the PREFILTERS keyword check before any pattern is run.
+        """
+        keywords = cls.PREFILTERS.get(pattern_name)
+        if keywords and not any(k in folded for k in keywords):
+            return []
+        matches = []
+        for pattern in cls.PATTERNS[pattern_name]:
+            matches.extend(pattern.findall(text))
+        return matches
+
     @staticmethod
     def _dedupe(matches: List[Any]) -> List[str]:
         """Removes duplicates while preserving order."""     
@@ -143,23 +222,27 @@ class InvoiceRegexExtractor:
     @classmethod
     def _parse_amounts(cls, matches: List[Any]) -> List[float]:
         """Parses currency strings (EU/US formats) into floats."""
-        parsed = []
+        parsed = {}
         for amount in matches:
             if isinstance(amount, tuple): amount = amount[0]
             if not amount: continue
-            try:
-                clean = amount.replace(' ', '')
-                if ',' in clean and '.' in clean:
-                    if clean.rindex(',') > clean.rindex('.'): 
-                        clean = clean.replace('.', '').replace(',', '.')
-                    else: 
-                        clean = clean.replace(',', '')
-                elif ',' in clean:
-                    if len(clean.split(',')[1]) == 2: clean = clean.replace(',', '.')
-                    else: clean = clean.replace(',', '')
-                parsed.append(float(clean))
-            except: continue
-        return list(dict.fromkeys(parsed))
+            clean = amount.replace(' ', '')
+            last_comma = clean.rfind(',')
+            if last_comma >= 0:
+                last_dot = clean.rfind('.')
+                if last_dot >= 0:
+                    # Both separators: whichever comes last is the decimal mark
+                    table = cls.AMOUNT_EU if last_comma > last_dot else cls.AMOUNT_US
+                else:
+                    # Comma only: decimal mark if exactly 2 digits follow the first comma
+                    first_comma = clean.find(',')
+                    next_comma = clean.find(',', first_comma + 1)
+                    group_len = (next_comma if next_comma >= 0 else len(clean)) - first_comma - 1
+                    table = cls.AMOUNT_EU if group_len == 2 else cls.AMOUNT_US
+                clean = clean.translate(table)
+            try: parsed[float(clean)] = None
+            except ValueError: continue
+        return list(parsed)
 
     @classmethod
     def _parse_vat(cls, matches: List[Any]) -> List[str]:
@@ -175,8 +258,8 @@ class InvoiceRegexExtractor:
     def normalize_vat_number(cls, raw_value: str) -> Optional[Tuple[str, str]]:
         """Cleans VAT strings to standard formats (e.g., removing separators)."""
         if not raw_value: return None
-        cleaned = re.sub(r'[\s.\-]', '', raw_value.upper())
-        cleaned = re.sub(r'^(BTWID|BTWNR|BTW|VATID|VATNR|VAT|TAXID|TAXNR|TAX)', '', cleaned)
+        cleaned = cls.VAT_SEPARATORS.sub('', raw_value.upper())
+        cleaned = cls.VAT_LABEL_PREFIX.sub('', cleaned)
         if cls.VAT_NL_CANON.match(cleaned):
             return (f"NL{cleaned[2:11]}B{cleaned[-2:]}", 'nl')
         if cls.VAT_EU_GENERIC.match(cleaned):
@@ -196,12 +279,24 @@ class InvoiceRegexExtractor:
         """Converts various date string formats to ISO 8601 (YYYY-MM-DD)."""
         if not raw: return None
         s = raw.strip()
-        numeric_formats = ["%d-%m-%Y", "%d/%m/%Y", "%d-%m-%y", "%d/%m/%y", "%Y-%m-%d", "%Y/%m/%d"]
-        for fmt in numeric_formats:
-            try: return datetime.strptime(s, fmt).strftime("%Y-%m-%d")
-            except ValueError: pass
+
+        # Numeric layouts: one anchored match instead of trying six strptime formats
+        m = cls.DATE_NUMERIC_DMY.match(s)
+        if m:
+            day, month, year = int(m.group(1)), int(m.group(3)), m.group(4)
+            if len(year) == 2:
+                # Same pivot as strptime's %y: 69-99 -> 19xx, 00-68 -> 20xx
+                yy = int(year)
+                year = 1900 + yy if yy >= 69 else 2000 + yy
+            try: return datetime(int(year), month, day).strftime("%Y-%m-%d")
+            except ValueError: return None
+
+        m = cls.DATE_NUMERIC_YMD.match(s)
+        if m:
+            try: return datetime(int(m.group(1)), int(m.group(3)), int(m.group(4))).strftime("%Y-%m-%d")
+            except ValueError: return None
         
-        m = re.match(r"^\s*(\d{1,2})\s+([A-Za-z]+)\s+(\d{4})\s*$", s)
+        m = cls.DATE_DAY_MONTH_YEAR.match(s)
         if m:
             day, month, year = m.groups()
             month_num = cls.MONTHS_NL.get(month.lower())
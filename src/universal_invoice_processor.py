@@ -18,7 +18,8 @@ It is responsible for the initial ingestion of PDF files, converting them into r
 and performing a first-pass analysis using deterministic tools (Regex).
 
 Key Responsibilities:
-1. **Text Extraction:** extracting text from PDFs using `pdfplumber` (with `PyPDF2` fallback).
+1. **Text Extraction:** extracting text from PDFs using `pdfplumber` (with `pypdfium2` and `PyPDF2` fallbacks).
+   Set `INVOICE_TEXT_ENGINE=pypdfium2` to make the much faster `pypdfium2` the primary extractor.
 2. **Pattern Recognition:** Using `InvoiceRegexExtractor` to find potential client cases, dates, and amounts.
 3. **Validation Gatekeeping:** Checking found client codes against the `ClientCaseMatcher` database to filter out
    non-coaching invoices (e.g., utility bills) before they reach the expensive LLM stage.
@@ -26,25 +27,60 @@ Key Responsibilities:
 
 Dependencies:
     - `polars`: For efficient data handling and reporting.
-    - `pdfplumber` / `PyPDF2`: For PDF parsing.
+    - `orjson`: For writing the metadata and manifest JSON files.
+    - `pdfplumber` / `pypdfium2` / `PyPDF2`: For PDF parsing.
     - `regex_tools`: For shared regex patterns.
     - `clientcase_matcher`: For validation against the allowed-list.
 """
+import io
 import os
-import json
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass, field
 from enum import Enum
 from datetime import datetime
 
+import orjson
 import polars as pl
 import pdfplumber
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
 import PyPDF2
 
 from clientcase_matcher import ClientCaseMatcher, MatchResult
 from regex_tools import InvoiceRegexExtractor  # <--- NEW IMPORT
 
+# Match statuses counted in the client case verdict (in report order)
+CLIENT_CASE_STATUSES = ("exact", "fuzzy_io_swap", "fuzzy_edit1", "unknown", "ambiguous_io_swap")
+
+# Column types of the per-invoice summary DataFrame returned by process_all_invoices
+SUMMARY_SCHEMA = {
+    'filename': pl.Utf8,
+    'text_length': pl.Int64,
+    'extraction_method': pl.Utf8,
+    'client_cases_found': pl.Int64,
+    'all_case_numbers': pl.Utf8,
+    'invoice_numbers': pl.Utf8,
+    'amounts_found': pl.Int64,
+    'max_amount': pl.Float64,
+    'confidence_score': pl.Float64,
+    'processing_time': pl.Float64,
+    'has_error': pl.Boolean,
+}
+
+# Read buffer for the PyPDF2 fallback (the default 8 KiB means many small reads)
+PYPDF2_READ_BUFFER = 1 << 16
+
+# Threads writing raw_texts/ files while the batch loop keeps reporting
+RAW_TEXT_WRITERS = 2
+
+# Below this many PDFs the batch is processed in-process instead of in a worker pool
+PROCESS_POOL_MIN_FILES = 4
+
 class ExtractionMethod(Enum):
     """Enum for tracking which extraction method was used"""
     PDF_TEXT = "pdf_text_extraction"
@@ -53,7 +89,7 @@ class ExtractionMethod(Enum):
     FAILED = "extraction_failed"
 
 
-@dataclass
+@dataclass(slots=True)
 class UniversalInvoiceData:
     """
     Data Transfer Object (DTO) holding all extracted information for a single invoice.
@@ -69,16 +105,19 @@ class UniversalInvoiceData:
     dates_found: List[str] = field(default_factory=list)
     amounts_found: List[float] = field(default_factory=list)
     is_coaching_invoice: bool = False
+    has_images: Optional[bool] = None  # None = unknown (PDF could not be inspected)
     
     # Basic metadata
     text_length: int = 0
     confidence_score: float = 0.0
     processing_time: float = 0.0
     error_message: Optional[str] = None
+    text_preview: Optional[str] = None  # First 500 chars, kept after extracted_text is released
     
     # Structured data for LLM prompting
     llm_prompt: Optional[str] = None
     patterns_found: Dict[str, Any] = field(default_factory=dict)
+    client_case_summary: Optional[Dict[str, Any]] = None  # verdict, reason and status counts
 
 
 class UniversalInvoiceExtractor:
@@ -94,10 +133,14 @@ class UniversalInvoiceExtractor:
         invoice_dir (Path): Directory containing source PDF files.
         output_dir (Path): Directory where artifacts (raw text, metadata) will be saved.
         clientcase_matcher (ClientCaseMatcher): Instance of the validator logic.
+        text_engine (str): Primary text extractor, 'pdfplumber' (default) or 'pypdfium2'.
     """
     
-    def __init__(self, invoice_dir: str, output_dir: str):
+    def __init__(self, invoice_dir: str, output_dir: str, text_engine: Optional[str] = None):
         self.invoice_dir = Path(invoice_dir)
+        # pdfplumber keeps the visual reading order (the invoice date comes first on e.g. 0001);
+        # pypdfium2 is ~20x faster but follows the PDF content stream order.
+        self.text_engine = text_engine or os.getenv("INVOICE_TEXT_ENGINE", "pdfplumber")
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
@@ -123,50 +166,104 @@ class UniversalInvoiceExtractor:
         
         self.results = []
     
-    def extract_text_pdfplumber(self, pdf_path: Path) -> Tuple[str, bool]:
+    def extract_text_pdfplumber(self, pdf_path: Path, data: Optional[bytes] = None) -> Tuple[str, bool, Optional[bool]]:
         """
         Primary extraction method using `pdfplumber`.
         Ideally suited for digital-born PDFs (selectable text).
+        If `data` (the PDF bytes) is given, it is parsed instead of re-reading `pdf_path`.
+        Also reports whether any page holds embedded images (None if the PDF could not be parsed).
         """
         try:
-            text = ""
-            with pdfplumber.open(pdf_path) as pdf:
+            parts = []
+            has_images = False
+            with pdfplumber.open(io.BytesIO(data) if data is not None else pdf_path) as pdf:
+                # No laparams: pdfminer's layout analysis stays off, extract_text only needs the chars
                 for page_num, page in enumerate(pdf.pages, 1):
                     page_text = page.extract_text()
+                    # The page objects are already parsed for the text, so this check is free
+                    has_images = has_images or bool(page.images)
+                    # Drop the parsed char/layout objects; pdf.pages keeps every Page alive
+                    page.flush_cache()
                     if page_text:
                         # Add page markers for LLM context
-                        text += f"\n--- Page {page_num} ---\n{page_text}\n"
+                        parts.append(f"\n--- Page {page_num} ---\n{page_text}\n")
+            text = "".join(parts)
             
             if len(text.strip()) > 50:
-                return text, True
-            return text, False
+                return text, True, has_images
+            return text, False, has_images
             
         except Exception as e:
             print(f"PDFPlumber extraction failed for {pdf_path.name}: {e}")
-            return "", False
+            return "", False, None
     
-    def extract_text_pypdf2(self, pdf_path: Path) -> Tuple[str, bool]:
+    def extract_text_pypdfium2(self, pdf_path: Path, data: Optional[bytes] = None) -> Tuple[str, bool, Optional[bool]]:
+        """
+        Fast extraction method using `pypdfium2` (PDFium, in C++).
+        Primary extractor when `text_engine='pypdfium2'`, otherwise the first fallback.
+        If `data` (the PDF bytes) is given, it is parsed instead of re-reading `pdf_path`.
+        Also reports whether any page holds embedded images (None if the PDF could not be parsed).
+        """
+        try:
+            parts = []
+            has_images = False
+            pdf = pdfium.PdfDocument(data if data is not None else str(pdf_path))
+            try:
+                for page_num in range(1, len(pdf) + 1):
+                    page = pdf[page_num - 1]
+                    if not has_images:
+                        # Walks the page object tree (including form XObjects); nothing is decoded
+                        has_images = next(page.get_objects(filter=(pdfium_c.FPDF_PAGEOBJ_IMAGE,)), None) is not None
+                    textpage = page.get_textpage()
+                    page_text = textpage.get_text_range().replace("\r\n", "\n")
+                    # Release native page memory right away
+                    textpage.close()
+                    page.close()
+                    if page_text:
+                        parts.append(f"\n--- Page {page_num} ---\n{page_text}\n")
+            finally:
+                pdf.close()
+            text = "".join(parts)
+
+            if len(text.strip()) > 50:
+                return text, True, has_images
+            return text, False, has_images
+
+        except Exception as e:
+            print(f"pypdfium2 extraction failed for {pdf_path.name}: {e}")
+            return "", False, None
+
+    def extract_text_pypdf2(self, pdf_path: Path, data: Optional[bytes] = None) -> Tuple[str, bool, Optional[bool]]:
         """
-        Secondary/Fallback extraction method using `PyPDF2`.
-        Used if `pdfplumber` fails or returns empty text.
+        Last-resort fallback extraction method using `PyPDF2`.
+        Used if `pdfplumber` and `pypdfium2` fail or return empty text.
+        If `data` (the PDF bytes) is given, it is parsed instead of re-reading `pdf_path`.
+        Does not inspect images (always reports None): PyPDF2 would have to decode them.
         """
         try:
-            text = ""
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
+            parts = []
+            if data is not None:
+                file = io.BytesIO(data)
+            else:
+                # PyPDF2 parses with many small seek/read calls; a 64 KiB buffer batches them
+                file = open(pdf_path, 'rb', buffering=PYPDF2_READ_BUFFER)
+            with file:
+                # Lenient parsing: this is the last resort for damaged PDFs, don't bail on spec nits
+                pdf_reader = PyPDF2.PdfReader(file, strict=False)
                 for page_num, page in enumerate(pdf_reader.pages, 1):
                     page_text = page.extract_text()
                     if page_text:
-                        text += f"\n--- Page {page_num} ---\n{page_text}\n"
+                        parts.append(f"\n--- Page {page_num} ---\n{page_text}\n")
+            text = "".join(parts)
             
             if len(text.strip()) > 50:
-                return text, True
-            return text, False
+                return text, True, None
+            return text, False, None
             
         except Exception as e:
             print(f"PyPDF2 extraction failed for {pdf_path.name}: {e}")
-            return "", False
-    
+            return "", False, None
+
     def find_patterns(self, text: str) -> Dict[str, Any]:
         """
         Extracts all patterns found in text using the shared `InvoiceRegexExtractor`.
@@ -178,6 +275,7 @@ class UniversalInvoiceExtractor:
         """
         Enriches the raw extracted client codes with validation status from the Database.
         It determines if a code is 'exact', 'fuzzy' (typo corrected), or 'unknown'.
+        Codes are resolved in one `match_many` call, so repeated codes are matched once.
         """
         if not self.clientcase_matcher:
             return
@@ -187,8 +285,8 @@ class UniversalInvoiceExtractor:
             return
 
         match_info = {}
-        for code in cases:
-            result: MatchResult = self.clientcase_matcher.match(code)
+        results: Dict[str, MatchResult] = self.clientcase_matcher.match_many(cases)
+        for code, result in results.items():
             match_info[code] = {
                 "matchedCode": result.matched_code,
                 "matchStatus": result.match_status,
@@ -213,24 +311,12 @@ class UniversalInvoiceExtractor:
             return {
                 "verdict": "reject",
                 "reason": "No clientCaseNumbers found; likely not a coaching invoice",
-                "counts": {
-                    "exact": 0,
-                    "fuzzy_io_swap": 0,
-                    "unknown": 0,
-                    "ambiguous_io_swap": 0,
-                },
+                "counts": dict.fromkeys(CLIENT_CASE_STATUSES, 0),
             }
 
-        counts = {
-            "exact": 0,
-            "fuzzy_io_swap": 0,
-            "unknown": 0,
-            "ambiguous_io_swap": 0,
-        }
-        for info in matches.values():
-            status = (info.get("matchStatus") or "").lower()
-            if status in counts:
-                counts[status] += 1
+        # One C-level tally over all statuses; counts are reported in full, so no early exit
+        tally = Counter((info.get("matchStatus") or "").lower() for info in matches.values())
+        counts = {status: tally[status] for status in CLIENT_CASE_STATUSES}
 
         verdict = "accept"
         reason = "All clientCaseNumbers are known and match exactly"
@@ -241,16 +327,22 @@ class UniversalInvoiceExtractor:
         elif counts["fuzzy_io_swap"] > 0:
             verdict = "needs_review"
             reason="Invoice contains clientCaseNumbers with historical character errors (e.g., 1/I or 0/O swaps). Characters “1” and “0” have now been auto-corrected to “I” and “O.”"
+        elif counts["fuzzy_edit1"] > 0:
+            verdict = "needs_review"
+            reason = "Invoice contains clientCaseNumbers with a single OCR character error (e.g., 5/S, 8/B or a missing hyphen). They have been auto-corrected with low confidence."
         return {
             "verdict": verdict,
             "reason": reason,
             "counts": counts,
         }
     
+    def raw_text_path(self, filename: str) -> Path:
+        """Returns where `save_raw_text` stores the raw text of the given PDF."""
+        return self.raw_text_dir / f"{Path(filename).stem}_raw.txt"
+
     def save_raw_text(self, filename: str, text: str) -> Path:
         """Saves the extracted raw text to disk for the LLM Agent to consume."""
-        text_filename = filename.replace('.pdf', '_raw.txt')
-        text_path = self.raw_text_dir / text_filename
+        text_path = self.raw_text_path(filename)
         
         with open(text_path, 'w', encoding='utf-8') as f:
             f.write(f"=== RAW TEXT EXTRACTION ===\n")
@@ -294,20 +386,35 @@ class UniversalInvoiceExtractor:
         Orchestrates the processing of a single PDF file.
         
         Steps:
-        1. Text Extraction (PDFPlumber -> PyPDF2)
+        1. Text Extraction (PDFPlumber -> pypdfium2 -> PyPDF2, or pypdfium2 first)
         2. Pattern Extraction (Regex)
         3. Data Enrichment (ClientCaseMatcher)
         4. Scoring & Classification
         """
-        start_time = datetime.now()
+        start_time = time.perf_counter()  # monotonic, unaffected by clock changes
+
+        # Read the PDF once; every extractor parses these bytes
+        try:
+            data = pdf_path.read_bytes()
+        except OSError as e:
+            print(f"Could not read {pdf_path.name}: {e}")
+            data = None
         
-        # Try primary extraction
-        text, success = self.extract_text_pdfplumber(pdf_path)
+        # Try primary extraction, then the fallbacks until one yields usable text
+        if self.text_engine == "pypdfium2":
+            extractors = (self.extract_text_pypdfium2, self.extract_text_pdfplumber, self.extract_text_pypdf2)
+        else:
+            extractors = (self.extract_text_pdfplumber, self.extract_text_pypdfium2, self.extract_text_pypdf2)
         method = ExtractionMethod.PDF_TEXT
-        
-        # Fallback to PyPDF2 if needed
-        if not success:
-            text, success = self.extract_text_pypdf2(pdf_path)
+        # Embedded images (logos, scanned footers) hide text from the extractors; the flag tells
+        # the Orchestrator whether its OCR Tool could recover anything. None = not inspected.
+        has_images = None
+        for extract in extractors:
+            text, success, page_images = extract(pdf_path, data)
+            if page_images is not None:
+                has_images = page_images
+            if success:
+                break
         
         if not success:
             method = ExtractionMethod.FAILED
@@ -325,7 +432,8 @@ class UniversalInvoiceExtractor:
             dates_found=patterns.get('dates', []),
             amounts_found=patterns.get('amounts', []),
             text_length=len(text),
-            processing_time=(datetime.now() - start_time).total_seconds(),
+            has_images=has_images,
+            processing_time=time.perf_counter() - start_time,
             patterns_found=patterns,
             error_message=None if success else "Failed to extract text"
         )
@@ -334,8 +442,7 @@ class UniversalInvoiceExtractor:
         self.annotate_client_cases(invoice_data)
         
         # Evaluate client case verdict
-        client_case_summary = self._evaluate_client_case_verdict(invoice_data)
-        invoice_data.patterns_found["client_case_summary"] = client_case_summary
+        invoice_data.client_case_summary = self._evaluate_client_case_verdict(invoice_data)
 
         # Check if coaching invoice based on client cases present
         invoice_data.is_coaching_invoice = bool(invoice_data.client_case_numbers)
@@ -356,7 +463,14 @@ class UniversalInvoiceExtractor:
         Returns:
             pl.DataFrame: A summary dataframe containing metrics for all processed invoices.
         """
-        pdf_files = sorted(list(self.invoice_dir.glob("*.pdf")))
+        # scandir reuses the directory entry type, so no extra stat() per file;
+        # same selection as glob("*.pdf"): case-sensitive suffix, no hidden files
+        with os.scandir(self.invoice_dir) as entries:
+            pdf_files = sorted(
+                Path(entry.path)
+                for entry in entries
+                if entry.name.endswith(".pdf") and not entry.name.startswith(".") and entry.is_file()
+            )
         
         if not pdf_files:
             print(f"No PDF files found in {self.invoice_dir}")
@@ -365,13 +479,37 @@ class UniversalInvoiceExtractor:
         print(f"Found {len(pdf_files)} PDF files to process")
         print("="*60)
         
-        for pdf_file in pdf_files:
-            print(f"\nProcessing: {pdf_file.name}")
-            invoice_data = self.process_invoice(pdf_file)
+        # Extraction + regex + matching is CPU-bound and independent per PDF: run it in a
+        # process pool (one matcher per worker via the initializer) and report in file order.
+        # Small batches run in-process, where worker start-up would cost more than it saves.
+        # Results are consumed lazily, so only the invoice being reported holds its full text.
+        workers = min(os.cpu_count() or 1, len(pdf_files))
+        # Each raw text file is submitted to a background writer as soon as its result
+        # arrives, so the writes overlap with parsing (and reporting) the next PDFs
+        io_pool = ThreadPoolExecutor(max_workers=RAW_TEXT_WRITERS)
+        writes = []
+        pool = None
+        if len(pdf_files) < PROCESS_POOL_MIN_FILES or workers < 2:
+            processed = map(self.process_invoice, pdf_files)
+        else:
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(str(self.invoice_dir), str(self.output_dir), self.text_engine),
+            )
+            processed = pool.map(_process_one, pdf_files)
+
+        for pdf_file, invoice_data in zip(pdf_files, processed):
+            # One report per invoice, written in a single call instead of ~18 prints
+            lines = [f"\nProcessing: {pdf_file.name}"]
             self.results.append(invoice_data)
             
             # Save raw text
-            text_path = self.save_raw_text(invoice_data.filename, invoice_data.extracted_text)
+            text_path = self.raw_text_path(invoice_data.filename)
+            writes.append(io_pool.submit(self.save_raw_text, invoice_data.filename, invoice_data.extracted_text))
+            # The full text now lives in raw_texts/; keep only the preview in memory
+            invoice_data.text_preview = invoice_data.extracted_text[:500] or None
+            invoice_data.extracted_text = ""
             
             kvk_list = invoice_data.patterns_found.get("kvk_numbers", [])
             vat_list = invoice_data.patterns_found.get("vat_numbers", [])
@@ -379,7 +517,7 @@ class UniversalInvoiceExtractor:
             kvk_single = kvk_list[0] if kvk_list else None
             vat_single = vat_list[0] if vat_list else None
             
-            summary = invoice_data.patterns_found.get("client_case_summary", {})
+            summary = invoice_data.client_case_summary or {}
             verdict = summary.get("verdict", "N/A").upper()
             reason = summary.get("reason", "N/A")
 
@@ -391,27 +529,27 @@ class UniversalInvoiceExtractor:
             else:
                 color_code = "🔴"
             
-            print(f"  {color_code} VALIDATION VERDICT: {verdict}")
-            print(f"    Reason: {reason}")
+            lines.append(f"  {color_code} VALIDATION VERDICT: {verdict}")
+            lines.append(f"    Reason: {reason}")
             
-            print("\n  🔑 HEADER DATA STATUS (Initial Extract):")
+            lines.append("\n  🔑 HEADER DATA STATUS (Initial Extract):")
             
             # KVK Status
             if kvk_single:
-                print(f"    🟢 KVK: Found ({kvk_single})")
+                lines.append(f"    🟢 KVK: Found ({kvk_single})")
             else:
-                print("    🟡 KVK: Missing. Will trigger OCR fallback.")
+                lines.append("    🟡 KVK: Missing. Will trigger OCR fallback.")
                 
             # VAT Status
             if vat_single:
-                print(f"    🟢 VAT: Found ({vat_single})")
+                lines.append(f"    🟢 VAT: Found ({vat_single})")
             else:
-                print("    🟡 VAT: Missing. Will trigger OCR fallback.")
+                lines.append("    🟡 VAT: Missing. Will trigger OCR fallback.")
             
             # Print summary
-            print(f"  Text Length: {invoice_data.text_length} characters")
-            print(f"  Extraction: {invoice_data.extraction_method.value}")
-            print(f"  Client Cases Found: {len(invoice_data.client_case_numbers)}")
+            lines.append(f"  Text Length: {invoice_data.text_length} characters")
+            lines.append(f"  Extraction: {invoice_data.extraction_method.value}")
+            lines.append(f"  Client Cases Found: {len(invoice_data.client_case_numbers)}")
             # kvk_list = invoice_data.patterns_found.get("kvk_numbers", [])
             # vat_list = invoice_data.patterns_found.get("vat_numbers", [])
             
@@ -425,34 +563,43 @@ class UniversalInvoiceExtractor:
 
             # print(f"  KVK: {kvk_single if kvk_single else 'None'}")
             # print(f"  VAT: {vat_single if vat_single else 'None'}")
-            print(f"  Invoice Number: {inv_single if inv_single else 'None'}")
-            print(f"  Invoice Date: {date_single if date_single else 'None'}")
+            lines.append(f"  Invoice Number: {inv_single if inv_single else 'None'}")
+            lines.append(f"  Invoice Date: {date_single if date_single else 'None'}")
             if invoice_data.client_case_numbers:
-                print(f"    Cases: {', '.join(invoice_data.client_case_numbers[:5])}")
+                lines.append(f"    Cases: {', '.join(invoice_data.client_case_numbers[:5])}")
                 if len(invoice_data.client_case_numbers) > 5:
-                    print(f"    ... and {len(invoice_data.client_case_numbers)-5} more")
-            print(f"  Amounts Found: {len(invoice_data.amounts_found)}")
-            print(f"  Confidence: {invoice_data.confidence_score:.2f}")
-            print(f"  Raw Text: {text_path.name}")
+                    lines.append(f"    ... and {len(invoice_data.client_case_numbers)-5} more")
+            lines.append(f"  Amounts Found: {len(invoice_data.amounts_found)}")
+            lines.append(f"  Confidence: {invoice_data.confidence_score:.2f}")
+            lines.append(f"  Raw Text: {text_path.name}")
+            sys.stdout.write("\n".join(lines) + "\n")
+
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+        # Wait for the writers and surface any write error instead of losing it in a future
+        io_pool.shutdown(wait=True)
+        for write in writes:
+            write.result()
         
-        # Create summary DataFrame
-        df_data = []
-        for inv in self.results:
-            df_data.append({
-                'filename': inv.filename,
-                'text_length': inv.text_length,
-                'extraction_method': inv.extraction_method.value,
-                'client_cases_found': len(inv.client_case_numbers),
-                'all_case_numbers': '|'.join(inv.client_case_numbers),
-                'invoice_numbers': '|'.join(inv.invoice_numbers),
-                'amounts_found': len(inv.amounts_found),
-                'max_amount': max(inv.amounts_found) if inv.amounts_found else None,
-                'confidence_score': inv.confidence_score,
-                'processing_time': inv.processing_time,
-                'has_error': inv.error_message is not None
-            })
-        
-        df = pl.DataFrame(df_data)
+        # Create summary DataFrame (column-wise, with a fixed schema so Polars skips inference)
+        results = self.results
+        df = pl.DataFrame(
+            {
+                'filename': [inv.filename for inv in results],
+                'text_length': [inv.text_length for inv in results],
+                'extraction_method': [inv.extraction_method.value for inv in results],
+                'client_cases_found': [len(inv.client_case_numbers) for inv in results],
+                'all_case_numbers': ['|'.join(inv.client_case_numbers) for inv in results],
+                'invoice_numbers': ['|'.join(inv.invoice_numbers) for inv in results],
+                'amounts_found': [len(inv.amounts_found) for inv in results],
+                'max_amount': [max(inv.amounts_found) if inv.amounts_found else None for inv in results],
+                'confidence_score': [inv.confidence_score for inv in results],
+                'processing_time': [inv.processing_time for inv in results],
+                'has_error': [inv.error_message is not None for inv in results],
+            },
+            schema=SUMMARY_SCHEMA,
+        )
         return df
 
     def save_results(self, df: pl.DataFrame):
@@ -463,28 +610,31 @@ class UniversalInvoiceExtractor:
             1. `invoice_metadata.json`: Detailed metrics and regex matches per invoice.
             2. `manifest.json`: A high-level index file used by the `capstone_agents.py` loader.
             """
-            # Save complete JSON for programmatic access
+            # Complete JSON for programmatic access, plus a manifest for LLM batch processing;
+            # both are filled in the same pass over the results
             json_data = {}
-            for inv in self.results:
-                # Haal summary op (zit nu nog in patterns_found)
-                client_case_summary = inv.patterns_found.get("client_case_summary", None)
+            manifest = {
+                "total_invoices": len(self.results),
+                "processing_date": datetime.now().isoformat(),
+                "output_structure": {
+                    "raw_texts": "Full extracted text for each invoice",
+                    "extraction_summary.csv": "Overview of all invoices",
+                    "invoice_metadata.json": "Detailed metadata and patterns",
+                },
+                "invoices": [],
+            }
+            manifest_invoices = manifest["invoices"]
 
-                # Safety cleanup
-                kvk_list = inv.patterns_found.get("kvk_numbers", [])
-                vat_list = inv.patterns_found.get("vat_numbers", [])
+            for inv in self.results:
+                patterns = inv.patterns_found
+                kvk_list = patterns.get("kvk_numbers", [])
+                vat_list = patterns.get("vat_numbers", [])
                 
                 kvk_val = kvk_list[0] if kvk_list else None
                 vat_val = vat_list[0] if vat_list else None
                 inv_num = inv.invoice_numbers[0] if inv.invoice_numbers else None
                 inv_date = inv.dates_found[0] if inv.dates_found else None
 
-                # --- FIX DUPLICATE DATA ---
-                # We maken een schone kopie van patterns_found ZONDER de summary
-                # (want die zetten we zo meteen als top-level key neer)
-                patterns_clean = inv.patterns_found.copy()
-                patterns_clean.pop("client_case_summary", None)
-                # --------------------------
-
                 json_data[inv.filename] = {
                     "text_length": inv.text_length,
                     "extraction_method": inv.extraction_method.value,
@@ -493,33 +643,14 @@ class UniversalInvoiceExtractor:
                     "vat": vat_val,
                     "invoice_number": inv_num,
                     "invoice_date": inv_date,
-                    "patterns_found": patterns_clean,  # Gebruik de opgeschoonde dict
-                    "client_case_summary": client_case_summary,
-                    "raw_text_file": f"raw_texts/{inv.filename.replace('.pdf', '_raw.txt')}",
-                    "text_preview": inv.extracted_text[:500] if inv.extracted_text else None,
+                    "patterns_found": patterns,
+                    "client_case_summary": inv.client_case_summary,
+                    "raw_text_file": f"raw_texts/{self.raw_text_path(inv.filename).name}",
+                    "has_images": inv.has_images,
+                    "text_preview": inv.text_preview,
                 }
-            
-            json_path = self.output_dir / "invoice_metadata.json"
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(json_data, f, indent=2, ensure_ascii=False)
-            print(f"Metadata saved..")
-            
-            # Create a manifest file for LLM batch processing
-            manifest = {
-                "total_invoices": len(self.results),
-                "processing_date": datetime.now().isoformat(),
-                "output_structure": {
-                    "raw_texts": "Full extracted text for each invoice",
-                    "extraction_summary.csv": "Overview of all invoices",
-                    "invoice_metadata.json": "Detailed metadata and patterns",
-                },
-                "invoices": [],
-            }
 
-            for inv in self.results:
-                # We moeten hier wel de originele patterns_found gebruiken (of de variabele die we eerder pakten)
-                # Omdat we inv.patterns_found niet in-place hebben aangepast, werkt dit nog steeds.
-                client_case_summary = inv.patterns_found.get("client_case_summary", {})
+                client_case_summary = inv.client_case_summary or {}
                 verdict = client_case_summary.get("verdict", "accept")
                 reason = client_case_summary.get("reason", None)
 
@@ -529,7 +660,7 @@ class UniversalInvoiceExtractor:
                     and verdict != "reject"
                 )
 
-                manifest["invoices"].append(
+                manifest_invoices.append(
                     {
                         "filename": inv.filename,
                         "confidence": inv.confidence_score,
@@ -540,13 +671,32 @@ class UniversalInvoiceExtractor:
                     }
                 )
             
+            json_path = self.output_dir / "invoice_metadata.json"
+            json_path.write_bytes(orjson.dumps(json_data, option=orjson.OPT_INDENT_2))
+            print(f"Metadata saved..")
+            
             manifest_path = self.output_dir / "manifest.json"
-            with open(manifest_path, 'w', encoding='utf-8') as f:
-                json.dump(manifest, f, indent=2)
+            manifest_path.write_bytes(orjson.dumps(manifest, option=orjson.OPT_INDENT_2))
             print(f"Manifest saved...")
             
             return df
 
+# --- PROCESS POOL WORKERS ---
+# Module-level so they can be pickled by ProcessPoolExecutor (also under 'spawn').
+_WORKER_EXTRACTOR: Optional[UniversalInvoiceExtractor] = None
+
+
+def _init_worker(invoice_dir: str, output_dir: str, text_engine: str) -> None:
+    """Builds one extractor (and thus one loaded ClientCaseMatcher) per worker process."""
+    global _WORKER_EXTRACTOR
+    _WORKER_EXTRACTOR = UniversalInvoiceExtractor(invoice_dir, output_dir, text_engine)
+
+
+def _process_one(pdf_path: Path) -> UniversalInvoiceData:
+    """Processes a single PDF inside a worker process."""
+    return _WORKER_EXTRACTOR.process_invoice(pdf_path)
+
+
 def main():
     # """Main execution function"""
    # Use dynamic paths based on script location (src/universal_invoice_processor.py -> parent=src -> parent=root)
@@ -20,17 +20,39 @@ Key Responsibilities:
 1. **Data Loading:** Reading manifest files, metadata, and raw text for processing.
 2. **Context Preparation:** assembling the correct "hints" and "allowed lists" for the Agent prompts.
 3. **Output Cleaning:** stripping Markdown formatting from LLM responses to ensure valid JSON.
-4. **Post-Processing:** Applying corrections (OCR fixes) and enforcing strict business rules on the extraction results.
+4. **Prompt Windowing:** trimming the raw text to the regions that hold header data.
+5. **Post-Processing:** Applying corrections (OCR fixes) and enforcing strict business rules on the extraction results.
 
 Dependencies:
     - `llm_models`: For type-safe manipulation of the invoice data structures.
+    - `orjson`: For fast parsing of the pre-processing output and the LLM's JSON responses.
+    - `regex_tools`: For the shared regex engine selection (optional `google-re2`).
 """
 
-import json
+import logging
+import os
+import pickle
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable
+
+import orjson
 
 from llm_models import InvoiceLLMResult
+from regex_tools import USE_RE2, re2
+
+# Child of the Orchestrator's logger, so these records share its queue-based console handler
+logger = logging.getLogger("capstone_agents.utils")
+
+# Markdown fence fallback: skip the opening ``` line, keep everything up to the next ``` (or the end).
+# Follows INVOICE_REGEX_ENGINE=re2 (see regex_tools); RE2 spells end-of-text as \z instead of \Z.
+if USE_RE2:
+    _FENCE_RE = re2.compile(r"(?s)```[^\n]*\n?(.*?)(?:```|\z)")
+else:
+    _FENCE_RE = re.compile(r"```[^\n]*\n?(.*?)(?:```|\Z)", re.DOTALL)
+
 
 def strip_markdown_json_fences(s: str) -> str:
     """
@@ -49,111 +71,201 @@ def strip_markdown_json_fences(s: str) -> str:
     """
     if not s:
         return s
-        
+
+    # Zoek naar het begin en einde van het JSON object. The braces are not whitespace, so
+    # the slice is the same with or without strip(); the reverse scan stops at the first '{'.
+    start_idx = s.find("{")
+    if start_idx != -1:
+        end_idx = s.rfind("}", start_idx)
+        if end_idx != -1:
+            # Pak alles tussen de eerste { en laatste }
+            return s[start_idx : end_idx + 1]
+
     text = s.strip()
-    
-    # Zoek naar het begin en einde van het JSON object
-    start_idx = text.find("{")
-    end_idx = text.rfind("}")
-    
-    if start_idx != -1 and end_idx != -1:
-        # Pak alles tussen de eerste { en laatste }
-        return text[start_idx : end_idx + 1]
-        
+
     # Fallback: als we geen brackets vinden, proberen we standaard markdown stripping
-    if text.startswith("```"):
-        lines = text.splitlines()
-        lines = lines[1:]
-        text = "\n".join(lines).strip()
-        if "```" in text:
-            parts = text.split("```")
-            text = parts[0].strip()
-            
+    m = _FENCE_RE.match(text)
+    if m:
+        return m.group(1).strip()
+
     return text
 
-def apply_client_case_corrections(result: InvoiceLLMResult, correction_map: Dict[str, str]) -> InvoiceLLMResult:
+def parse_llm_json(s: str) -> Any:
     """
-    Applies canonical corrections to the Agent's output based on pre-calculated matches.
+    Parses the JSON object from a raw LLM response.
 
-    This function bridges the gap between OCR errors (e.g., '125') and database reality (e.g., 'I25').
-    It checks the code returned by the Agent against a correction map. If a correction exists,
-    it swaps the values and preserves the original 'typo' for audit purposes.
+    Well-behaved responses are already clean JSON and are parsed directly; only if that
+    fails is the response cleaned with `strip_markdown_json_fences` and parsed again.
 
     Args:
-        result (InvoiceLLMResult): The initial result object from the Agent.
-        correction_map (Dict[str, str]): A mapping of {Raw_Code -> Corrected_Code} derived from 
-                                         the Universal Processor phase.
+        s (str): The raw string response from the LLM.
 
     Returns:
-        InvoiceLLMResult: The updated result object with corrected case IDs.
+        Any: The decoded JSON value (normally a dict).
+
+    Raises:
+        orjson.JSONDecodeError: If the response holds no valid JSON, even after cleaning.
     """
-    for case in result.clientCases:
-        # De agent heeft in eerste instantie gevuld wat hij zag in 'validatedClientCaseNumber'
-        # (omdat de prompt dat vroeg). We checken nu of die waarde gecorrigeerd moet worden.
-        raw_code = case.validatedClientCaseNumber
-        
-        if raw_code in correction_map:
-            corrected_code = correction_map[raw_code]
-            
-            # Only swap if they are different
-            if raw_code != corrected_code:
-                print(f"   ✨ Auto-Correcting: {raw_code} -> {corrected_code}")
-                
-                # Bewaar de originele (foute) OCR tekst in het 'raw' veld
-                case.rawClientCaseNumber = raw_code
-                
-                # Update het hoofdveld naar de correcte database code
-                case.validatedClientCaseNumber = corrected_code
-    
-    # Also fix NoActivity list (dit zijn strings, dus direct vervangen)
-    fixed_no_activity = []
-    for code in result.clientCasesNoActivity:
-        if code in correction_map:
-            fixed_no_activity.append(correction_map[code])
-        else:
-            fixed_no_activity.append(code)
-    
-    result.clientCasesNoActivity = sorted(list(set(fixed_no_activity)))
-    
-    return result
+    try:
+        return orjson.loads(s)
+    except orjson.JSONDecodeError:
+        return orjson.loads(strip_markdown_json_fences(s))
+
+# Page markers written by the Universal Processor ("--- Page 1 ---")
+_PAGE_MARKER_RE = re.compile(r"^--- Page \d+ ---$", re.MULTILINE)
+# Lines that carry header data wherever they appear on the page (sidebars, footers)
+_HEADER_KEYWORD_RE = re.compile(r"(?i)\b(?:kvk|btw|vat|iban|t\.?n\.?v|factuur|invoice|datum|date)")
 
-def enforce_allowed_client_cases(result: InvoiceLLMResult, allowed: List[str]) -> InvoiceLLMResult:
+def get_header_window(raw_text: str, head_lines: int = 20, tail_lines: int = 6, min_chars: int = 3000) -> str:
     """
-    Acts as the final Gatekeeper for data quality.
+    Trims the raw text to the regions where invoice header data lives.
 
-    Ensures that every client case number remaining in the result is present in the 
-    strict 'Allowed List' for this specific invoice. Any code not in the list is dropped.
-    This prevents hallucinations or non-existent codes from entering the downstream system.
+    Supplier details, invoice number and date sit at the top of a page, while KvK/VAT/IBAN
+    usually sit in the page footer. For each page this keeps the first `head_lines`, the
+    last `tail_lines` and any line mentioning a header keyword; the line-item table in
+    between is replaced by a '[...]' marker. This cuts the HeaderAgent's input tokens on
+    long, multi-page invoices.
 
     Args:
-        result (InvoiceLLMResult): The extracted invoice data.
-        allowed (List[str]): The strict list of valid client case IDs for this context.
+        raw_text (str): The full extracted text (with '--- Page N ---' markers).
+        head_lines (int): Number of lines kept from the top of every page.
+        tail_lines (int): Number of lines kept from the bottom of every page.
+        min_chars (int): Texts shorter than this are returned unchanged (nothing to gain).
 
     Returns:
-        InvoiceLLMResult: The filtered result object containing only valid cases.
+        str: The windowed text, or the original text if it is short.
     """
-    allowed_set = set(allowed)
+    if not raw_text or len(raw_text) < min_chars:
+        return raw_text
+
+    # Split keeps the preamble (before the first marker) as its own 'page'
+    bounds = [m.start() for m in _PAGE_MARKER_RE.finditer(raw_text)]
+    starts = [0] + bounds
+    ends = bounds + [len(raw_text)]
+
+    windows = []
+    for start, end in zip(starts, ends):
+        lines = raw_text[start:end].splitlines()
+        if len(lines) <= head_lines + tail_lines:
+            windows.append("\n".join(lines))
+            continue
 
-    filtered_active = []
-    for case in result.clientCases:
-        # UPDATE: We checken nu het gevalideerde veld
-        if case.validatedClientCaseNumber in allowed_set:
-            filtered_active.append(case)
-        else:
-            print(f"   [WARN] Dropping invalid clientCaseNumber in clientCases: {case.validatedClientCaseNumber!r}")
+        middle = lines[head_lines:len(lines) - tail_lines]
+        kept_middle = [line for line in middle if _HEADER_KEYWORD_RE.search(line)]
+        windows.append("\n".join(lines[:head_lines] + ["[...]"] + kept_middle + lines[len(lines) - tail_lines:]))
 
-    filtered_no_activity = []
-    for code in result.clientCasesNoActivity or []:
+    return "\n".join(windows)
+
+def correct_and_enforce_client_cases(result: InvoiceLLMResult, correction_map: Dict[str, str],
+                                     allowed: Iterable[str]) -> InvoiceLLMResult:
+    """
+    Applies canonical corrections to the Agent's output and then acts as the final Gatekeeper.
+
+    Bridges the gap between OCR errors (e.g., '125') and database reality (e.g., 'I25'): each
+    client case is corrected via the correction map (the original 'typo' is kept for audit
+    purposes) and then checked against the strict 'Allowed List' for this invoice. Any code
+    not in the list is dropped, so hallucinated or non-existent codes never enter the
+    downstream system.
+
+    Args:
+        result (InvoiceLLMResult): The merged result object from the Agents.
+        correction_map (Dict[str, str]): A mapping of {Raw_Code -> Corrected_Code}.
+        allowed (Iterable[str]): The strict list of valid client case IDs for this context
+                                 (a `frozenset` is used as-is).
+
+    Returns:
+        InvoiceLLMResult: The corrected result object containing only valid cases.
+    """
+    allowed_set = allowed if isinstance(allowed, frozenset) else frozenset(allowed)
+
+    for case in result.clientCases:
+        raw_code = case.validatedClientCaseNumber
+        code = correction_map.get(raw_code, raw_code)
+        if code != raw_code:
+            logger.info("   ✨ Auto-Correcting: %s -> %s", raw_code, code)
+            # Bewaar de originele (foute) OCR tekst in het 'raw' veld
+            case.rawClientCaseNumber = raw_code
+            case.validatedClientCaseNumber = code
+
+    # Normally nothing is dropped, so the filter is a comprehension and the drops are
+    # only looked up (and logged) if there are any
+    filtered_active = [case for case in result.clientCases if case.validatedClientCaseNumber in allowed_set]
+    if len(filtered_active) != len(result.clientCases):
+        for case in result.clientCases:
+            if case.validatedClientCaseNumber not in allowed_set:
+                logger.warning("   [WARN] Dropping invalid clientCaseNumber in clientCases: %r",
+                               case.validatedClientCaseNumber)
+
+    filtered_no_activity = set()
+    for raw_code in result.clientCasesNoActivity or []:
+        code = correction_map.get(raw_code, raw_code)
         if code in allowed_set:
-            filtered_no_activity.append(code)
+            filtered_no_activity.add(code)
         else:
-            print(f"   [WARN] Dropping invalid clientCaseNumber in clientCasesNoActivity: {code!r}")
+            logger.warning("   [WARN] Dropping invalid clientCaseNumber in clientCasesNoActivity: %r", code)
 
     result.clientCases = filtered_active
-    result.clientCasesNoActivity = sorted(list(set(filtered_no_activity)))
+    result.clientCasesNoActivity = sorted(filtered_no_activity)
     return result
 
-def load_all_coaching_invoices(base_dir: Path) -> List[Dict[str, Any]]:
+# Match statuses whose matchedCode may be used (and corrected to) by the Agents
+USABLE_MATCH_STATUSES = frozenset({"exact", "fuzzy_io_swap", "fuzzy_edit1"})
+
+# Threads reading raw_texts/ files in load_all_coaching_invoices (I/O-bound)
+RAW_TEXT_READERS = 16
+
+# Bump when the shape of the example dicts changes, so stale pickles are rebuilt
+EXAMPLES_CACHE_VERSION = 1
+
+
+def _examples_cache_key(*paths: Path, raw_texts: tuple = ()) -> tuple:
+    """
+    Identifies one pre-processing run by the mtime and size of its output files.
+    `raw_texts` holds (name, mtime_ns, size) per raw text file, so an edited text also misses.
+    """
+    key: List[Any] = [EXAMPLES_CACHE_VERSION]
+    for path in paths:
+        st = path.stat()
+        key.extend((st.st_mtime_ns, st.st_size))
+    key.append(raw_texts)
+    return tuple(key)
+
+
+def _read_examples_cache(cache_path: Path, key: tuple) -> Optional[List[Dict[str, Any]]]:
+    """Returns the cached examples if they were built from the same files, else None."""
+    try:
+        with open(cache_path, "rb") as f:
+            cached_key, examples = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("⚠️ Ignoring unreadable invoice cache %s: %s", cache_path, e)
+        return None
+    if cached_key != key:
+        return None
+
+    # Pickle does not intern strings: re-intern the codes, as a fresh build would
+    for example in examples:
+        correction_map = {sys.intern(raw): sys.intern(valid) for raw, valid in example["correction_map"].items()}
+        example["correction_map"] = correction_map
+        example["allowed_client_cases_prompt"] = [sys.intern(code) for code in example["allowed_client_cases_prompt"]]
+        example["allowed_client_cases_valid"] = frozenset(sys.intern(code) for code in example["allowed_client_cases_valid"])
+    return examples
+
+
+def _write_examples_cache(cache_path: Path, key: tuple, examples: List[Dict[str, Any]]) -> None:
+    """Writes the examples atomically (temp file + rename); a failed write only costs the cache."""
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump((key, examples), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning("⚠️ Could not write invoice cache %s: %s", cache_path, e)
+
+
+def load_all_coaching_invoices(base_dir: Path, use_cache: bool = True) -> List[Dict[str, Any]]:
     """
     Loads and prepares the invoice tasks for the Orchestrator.
 
@@ -162,11 +274,16 @@ def load_all_coaching_invoices(base_dir: Path) -> List[Dict[str, Any]]:
     - The raw text content.
     - Metadata hints (KvK, VAT).
     - A 'Prompt List' (containing raw codes/typos) to help the Agent 'see' the data.
-    - A 'Valid List' (containing correct codes) for final validation.
+    - A 'Valid Set' (frozenset of correct codes) for final validation.
     - A 'Correction Map' to translate between the two.
 
+    The result is pickled to `base_dir/.cache/examples.pkl`. Later runs reuse it as long as
+    manifest.json, invoice_metadata.json and the raw_texts/ files are unchanged (same
+    mtime and size); the Universal Processor rewrites all of them on every run.
+
     Args:
         base_dir (Path): The root directory containing 'manifest.json' and 'invoice_metadata.json'.
+        use_cache (bool): Set to False to always rebuild from the source files.
 
     Returns:
         List[Dict[str, Any]]: A list of invoice context dictionaries, sorted by filename.
@@ -179,15 +296,35 @@ def load_all_coaching_invoices(base_dir: Path) -> List[Dict[str, Any]]:
         print("❌ manifest.json or invoice_metadata.json not found.")
         return []
 
-    with open(manifest_path, "r", encoding="utf-8") as f:
-        manifest = json.load(f)
-
-    with open(metadata_path, "r", encoding="utf-8") as f:
-        metadata = json.load(f)
+    # One directory listing instead of an exists() stat per invoice; the raw text stats
+    # are part of the cache key, so a raw text edited by hand also rebuilds the cache
+    try:
+        stats = []
+        with os.scandir(raw_texts_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".txt") and entry.is_file():
+                    st = entry.stat()
+                    stats.append((entry.name, st.st_mtime_ns, st.st_size))
+    except FileNotFoundError:
+        stats = []
+    raw_text_stats = tuple(sorted(stats))
+    existing_raw_texts = frozenset(name for name, _, _ in raw_text_stats)
+
+    cache_path = base_dir / ".cache" / "examples.pkl"
+    cache_key = _examples_cache_key(manifest_path, metadata_path, raw_texts=raw_text_stats)
+    if use_cache:
+        cached = _read_examples_cache(cache_path, cache_key)
+        if cached is not None:
+            return cached
+
+    # orjson parses the UTF-8 bytes directly (no separate decode step)
+    manifest = orjson.loads(manifest_path.read_bytes())
+    metadata = orjson.loads(metadata_path.read_bytes())
 
     invoices = manifest.get("invoices", [])
     examples: List[Dict[str, Any]] = []
 
+    selected = []
     for inv in invoices:
         if not (inv.get("is_coaching_invoice") and inv.get("ready_for_llm")):
             continue
@@ -198,29 +335,30 @@ def load_all_coaching_invoices(base_dir: Path) -> List[Dict[str, Any]]:
         meta = metadata.get(filename)
         if meta is None: continue
 
-        raw_text_file = raw_texts_dir / filename.replace(".pdf", "_raw.txt")
-        if not raw_text_file.exists(): continue
+        raw_text_name = f"{Path(filename).stem}_raw.txt"
+        if raw_text_name not in existing_raw_texts: continue
+
+        selected.append((filename, meta, raw_texts_dir / raw_text_name))
 
-        with open(raw_text_file, "r", encoding="utf-8") as f:
-            raw_text = f.read()
+    # The raw texts are independent files: read them concurrently (file I/O releases the GIL)
+    with ThreadPoolExecutor(max_workers=RAW_TEXT_READERS) as pool:
+        raw_texts = list(pool.map(lambda path: path.read_text(encoding="utf-8"), [item[2] for item in selected]))
 
+    for (filename, meta, raw_text_file), raw_text in zip(selected, raw_texts):
         patterns_found = meta.get("patterns_found", {}) or {}
         
         # --- Build Correction Map ---
         client_case_matches = patterns_found.get("client_case_matches", {})
         
-        allowed_client_cases_raw = [] # Voor de Agent prompt (zodat hij de tekst vindt)
-        allowed_client_cases_valid = [] # Voor de validator (zodat we schone data krijgen)
-        correction_map = {} # De vertaalslag: Fout -> Goed
-
-        for raw_code, info in client_case_matches.items():
-            matched_code = info.get("matchedCode")
-            status = info.get("matchStatus")
-            
-            if matched_code and status in ["exact", "fuzzy_io_swap"]:
-                allowed_client_cases_raw.append(raw_code)
-                allowed_client_cases_valid.append(matched_code)
-                correction_map[raw_code] = matched_code
+        # De vertaalslag: Fout -> Goed (one entry per usable match, in invoice order).
+        # Codes are interned: the same code recurs across invoices, so they share one str object.
+        correction_map = {
+            sys.intern(raw_code): sys.intern(matched_code)
+            for raw_code, info in client_case_matches.items()
+            if (matched_code := info.get("matchedCode")) and info.get("matchStatus") in USABLE_MATCH_STATUSES
+        }
+        allowed_client_cases_raw = list(correction_map)  # Voor de Agent prompt (zodat hij de tekst vindt)
+        allowed_client_cases_valid = correction_map.values()  # Voor de validator (zodat we schone data krijgen)
 
         # ----------------------------------------
         
@@ -231,16 +369,21 @@ def load_all_coaching_invoices(base_dir: Path) -> List[Dict[str, Any]]:
             "vat_hint": meta.get("vat"),
             "invoice_number_hint": meta.get("invoice_number"),
             "invoice_date_hint": meta.get("invoice_date"),
+
+            # Orchestrator skips the OCR Tool when the PDF has no images to read
+            "has_images": meta.get("has_images"),
             
             # Agent krijgt RAW codes
             "allowed_client_cases_prompt": allowed_client_cases_raw, 
             
-            # Validator krijgt VALID codes
-            "allowed_client_cases_valid": allowed_client_cases_valid,
+            # Validator krijgt VALID codes (frozenset: O(1) lookups, built once per invoice)
+            "allowed_client_cases_valid": frozenset(allowed_client_cases_valid),
             
             # Utils krijgt de map
             "correction_map": correction_map
         })
         
     examples.sort(key=lambda x: x['filename'])
+    if use_cache:
+        _write_examples_cache(cache_path, cache_key, examples)
     return examples
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""
+Tests for the OCR cache and batcher in `ocr_tools`.
+
+Vision is replaced by a stub, so these run without Google credentials:
+    python -m unittest discover tests
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+import ocr_tools  # noqa: E402
+from ocr_tools import OcrBatcher, OcrCache  # noqa: E402
+
+
+def _fake_vision_batch(pdf_paths):
+    return [f"OCR text of {pdf_path.name}" for pdf_path in pdf_paths]
+
+
+class OcrBatcherTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp_dir = Path(self._tmp.name)
+        self.pdf_paths = []
+        for i in range(3):
+            pdf_path = self.tmp_dir / f"invoice_{i}.pdf"
+            pdf_path.write_bytes(f"%PDF-1.4 fake invoice {i}".encode())
+            self.pdf_paths.append(pdf_path)
+
+        patches = [
+            mock.patch.dict(os.environ, {}, clear=False),
+            mock.patch.object(ocr_tools, "HAS_DEPENDENCIES", True),
+            mock.patch.object(ocr_tools, "run_pdf_ocr_google_batch", side_effect=_fake_vision_batch),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        os.environ.pop("OCR_CACHE_DIR", None)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _run_concurrently(self, batcher):
+        async def run_all():
+            return await asyncio.gather(*(batcher.run(pdf_path) for pdf_path in self.pdf_paths))
+        return asyncio.run(run_all())
+
+    def test_unwritable_cache_dir_still_returns_ocr_text(self):
+        cache = OcrCache(self.tmp_dir / "ocr_cache")
+        # Replace the cache dir by a plain file: every write below it fails with an OSError,
+        # also when running as root (where chmod would not stop the writes)
+        cache.cache_dir.rmdir()
+        cache.cache_dir.write_text("not a directory")
+
+        texts = self._run_concurrently(OcrBatcher(cache, max_wait=0.01))
+
+        self.assertEqual(texts, [f"OCR text of {pdf_path.name}" for pdf_path in self.pdf_paths])
+        ocr_tools.run_pdf_ocr_google_batch.assert_called_once()
+
+    def test_failing_batch_resolves_every_waiter_with_empty_text(self):
+        cache = OcrCache(self.tmp_dir / "ocr_cache")
+        with mock.patch.object(cache, "run_many", side_effect=RuntimeError("boom")):
+            texts = self._run_concurrently(OcrBatcher(cache, max_wait=0.01))
+
+        self.assertEqual(texts, [""] * len(self.pdf_paths))
+
+
+if __name__ == "__main__":
+    unittest.main()